@@ -0,0 +1,52 @@
+"""add inventory ledger
+
+Revision ID: add_inventory_ledger
+Revises: add_order_stock_reserved
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_inventory_ledger'
+down_revision = 'add_order_stock_reserved'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Append-only stock movements; current stock = variant snapshot + later movements
+    op.create_table(
+        'inventory_movements',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('variant_id', sa.Integer(), sa.ForeignKey('product_variants.id', ondelete='CASCADE'),
+                  nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('note', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_inventory_movements_variant_id_id', 'inventory_movements', ['variant_id', 'id'])
+
+    # The existing stock becomes each variant's first snapshot (no movements folded in yet)
+    op.add_column('product_variants', sa.Column('stock_movement_id', sa.Integer(), nullable=False,
+                                                server_default='0'))
+    op.add_column('product_variants', sa.Column('stock_snapshot_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE product_variants SET stock = 0 WHERE stock IS NULL")
+
+
+def downgrade():
+    # Fold the whole ledger back into the stock column before dropping it
+    op.execute("""
+        UPDATE product_variants SET stock = coalesce(stock, 0) + coalesce((
+            SELECT sum(m.quantity) FROM inventory_movements m
+            WHERE m.variant_id = product_variants.id AND m.id > product_variants.stock_movement_id
+        ), 0)
+    """)
+    op.drop_column('product_variants', 'stock_snapshot_at')
+    op.drop_column('product_variants', 'stock_movement_id')
+    op.drop_index('ix_inventory_movements_variant_id_id', table_name='inventory_movements')
+    op.drop_table('inventory_movements')
@@ -0,0 +1,27 @@
+"""add product media content hash
+
+Revision ID: add_media_content_hash
+Revises: add_variant_options_index
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_content_hash'
+down_revision = 'add_variant_options_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SHA-256 of uploaded images; only exact duplicates reuse an asset by default
+    op.add_column('product_media', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_index('ix_product_media_content_hash', 'product_media', ['content_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_product_media_content_hash', table_name='product_media')
+    op.drop_column('product_media', 'content_hash')
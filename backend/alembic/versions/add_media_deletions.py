@@ -0,0 +1,37 @@
+"""add media deletion queue
+
+Revision ID: add_media_deletions
+Revises: add_product_listing
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_deletions'
+down_revision = 'add_product_listing'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cloudinary assets waiting to be deleted (see apps/products/media_cleanup.py)
+    op.create_table(
+        'media_deletions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('cloudinary_id', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index('ix_media_deletions_cloudinary_id', 'media_deletions', ['cloudinary_id'])
+    op.create_index('ix_media_deletions_next_attempt_at', 'media_deletions', ['next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_media_deletions_next_attempt_at', table_name='media_deletions')
+    op.drop_index('ix_media_deletions_cloudinary_id', table_name='media_deletions')
+    op.drop_table('media_deletions')
@@ -0,0 +1,29 @@
+"""add product media dimensions
+
+Revision ID: add_media_dimensions
+Revises: add_media_deletions
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_dimensions'
+down_revision = 'add_media_deletions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Original width/height/bytes from the Cloudinary upload result (NULL for existing media)
+    op.add_column('product_media', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('product_media', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('product_media', sa.Column('bytes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('product_media', 'bytes')
+    op.drop_column('product_media', 'height')
+    op.drop_column('product_media', 'width')
@@ -0,0 +1,27 @@
+"""add product media perceptual hash
+
+Revision ID: add_media_phash
+Revises: add_media_dimensions
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_phash'
+down_revision = 'add_media_dimensions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # dHash of uploaded images, used to reuse near-identical Cloudinary assets
+    op.add_column('product_media', sa.Column('phash', sa.String(16), nullable=True))
+    op.create_index('ix_product_media_phash', 'product_media', ['phash'])
+
+
+def downgrade():
+    op.drop_index('ix_product_media_phash', table_name='product_media')
+    op.drop_column('product_media', 'phash')
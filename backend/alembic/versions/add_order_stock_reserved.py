@@ -0,0 +1,25 @@
+"""add order stock reservation flag
+
+Revision ID: add_order_stock_reserved
+Revises: add_media_phash
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_stock_reserved'
+down_revision = 'add_media_phash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Orders placed before stock reservation never took stock, so cancelling them must not return any
+    op.add_column('orders', sa.Column('stock_reserved', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    op.drop_column('orders', 'stock_reserved')
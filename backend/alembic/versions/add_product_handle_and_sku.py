@@ -0,0 +1,33 @@
+"""add product handle and variant sku
+
+Revision ID: add_product_handle_and_sku
+Revises: add_product_search
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_handle_and_sku'
+down_revision = 'add_product_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Natural keys for catalog imports (INSERT ... ON CONFLICT targets)
+    op.add_column('products', sa.Column('handle', sa.String(255), nullable=True))
+    op.create_index('ix_products_handle', 'products', ['handle'], unique=True)
+
+    op.add_column('product_variants', sa.Column('sku', sa.String(100), nullable=True))
+    op.create_index('ix_product_variants_sku', 'product_variants', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_product_variants_sku', table_name='product_variants')
+    op.drop_column('product_variants', 'sku')
+
+    op.drop_index('ix_products_handle', table_name='products')
+    op.drop_column('products', 'handle')
@@ -0,0 +1,73 @@
+"""add product listing read model
+
+Revision ID: add_product_listing
+Revises: add_product_handle_and_sku
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_listing'
+down_revision = 'add_product_handle_and_sku'
+branch_labels = None
+depends_on = None
+
+LISTING_INDEXES = {
+    'ix_product_listing_status_created_at': ['status', 'created_at', 'product_id'],
+    'ix_product_listing_status_product_name': ['status', 'product_name', 'product_id'],
+    'ix_product_listing_status_min_price': ['status', 'min_price', 'product_id'],
+    'ix_product_listing_status_category_created_at': ['status', 'category', 'created_at', 'product_id'],
+    'ix_product_listing_status_product_type_created_at': ['status', 'product_type', 'created_at', 'product_id'],
+    'ix_product_listing_status_in_stock_created_at': ['status', 'in_stock', 'created_at', 'product_id'],
+}
+
+
+def upgrade():
+    # One precomputed row per product for the listing endpoints (see ProductService.sync_listing)
+    op.create_table(
+        'product_listing',
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('product_name', sa.String(255), nullable=False),
+        sa.Column('category', sa.String(255), nullable=True),
+        sa.Column('product_type', sa.String(50), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('min_price', sa.Numeric(12, 2), nullable=True),
+        sa.Column('max_price', sa.Numeric(12, 2), nullable=True),
+        sa.Column('total_stock', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('in_stock', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('primary_image', sa.String(), nullable=True),
+        sa.Column('synced_at', sa.DateTime(), nullable=True),
+    )
+    for name, columns in LISTING_INDEXES.items():
+        op.create_index(name, 'product_listing', columns)
+
+    # Backfill from the existing catalog
+    op.execute("""
+        INSERT INTO product_listing (
+            product_id, product_name, category, product_type, status, created_at,
+            min_price, max_price, total_stock, in_stock, primary_image, synced_at
+        )
+        SELECT p.id, p.product_name, p.category, p.product_type, p.status, p.created_at,
+               v.min_price, v.max_price, coalesce(v.total_stock, 0), coalesce(v.total_stock, 0) > 0,
+               (SELECT m.src FROM product_media m
+                WHERE m.product_id = p.id
+                ORDER BY CASE WHEN m.variant_id IS NULL THEN 0 ELSE 1 END, m.id
+                LIMIT 1),
+               now()
+        FROM products p
+        LEFT JOIN (
+            SELECT product_id, min(price) AS min_price, max(price) AS max_price, sum(stock) AS total_stock
+            FROM product_variants
+            GROUP BY product_id
+        ) v ON v.product_id = p.id
+    """)
+
+
+def downgrade():
+    for name in reversed(list(LISTING_INDEXES)):
+        op.drop_index(name, table_name='product_listing')
+    op.drop_table('product_listing')
@@ -0,0 +1,37 @@
+"""add product listing indexes
+
+Revision ID: add_product_listing_indexes
+Revises: add_product_category
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_listing_indexes'
+down_revision = 'add_product_category'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination of GET /products: (filter columns, sort column, id)
+    op.create_index('ix_products_status_created_at_id', 'products', ['status', 'created_at', 'id'])
+    op.create_index('ix_products_status_product_name_id', 'products', ['status', 'product_name', 'id'])
+    op.create_index('ix_products_status_category_created_at_id', 'products',
+                    ['status', 'category', 'created_at', 'id'])
+    op.create_index('ix_products_status_product_type_created_at_id', 'products',
+                    ['status', 'product_type', 'created_at', 'id'])
+
+    # Price range filter and lowest-price sort
+    op.create_index('ix_product_variants_product_id_price', 'product_variants', ['product_id', 'price'])
+
+
+def downgrade():
+    op.drop_index('ix_product_variants_product_id_price', table_name='product_variants')
+    op.drop_index('ix_products_status_product_type_created_at_id', table_name='products')
+    op.drop_index('ix_products_status_category_created_at_id', table_name='products')
+    op.drop_index('ix_products_status_product_name_id', table_name='products')
+    op.drop_index('ix_products_status_created_at_id', table_name='products')
@@ -0,0 +1,48 @@
+"""add product full-text search
+
+Revision ID: add_product_search
+Revises: add_product_listing_indexes
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_product_search'
+down_revision = 'add_product_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only: SQLite dev databases build an FTS5 table on first search instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Weighted document kept up to date by Postgres itself
+    op.execute("""
+        ALTER TABLE products ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(product_name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(ingredients, '')), 'C')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)")
+
+    # Typo tolerance on product names
+    op.execute("CREATE INDEX ix_products_product_name_trgm ON products USING gin (product_name gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_products_product_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_search_vector")
+    op.drop_column('products', 'search_vector')
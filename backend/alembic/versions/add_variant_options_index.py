@@ -0,0 +1,26 @@
+"""add variant options index
+
+Revision ID: add_variant_options_index
+Revises: add_inventory_ledger
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_variant_options_index'
+down_revision = 'add_inventory_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Resolving a variant from its option combination (GET /products/{id}/variants/resolve)
+    op.create_index('ix_product_variants_product_id_options', 'product_variants',
+                    ['product_id', 'option1', 'option2', 'option3'])
+
+
+def downgrade():
+    op.drop_index('ix_product_variants_product_id_options', table_name='product_variants')
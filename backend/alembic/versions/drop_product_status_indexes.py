@@ -0,0 +1,34 @@
+"""drop product status indexes
+
+Revision ID: drop_product_status_indexes
+Revises: add_media_content_hash
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'drop_product_status_indexes'
+down_revision = 'add_media_content_hash'
+branch_labels = None
+depends_on = None
+
+# from add_product_listing_indexes; GET /products reads product_listing since add_product_listing
+PRODUCT_INDEXES = {
+    'ix_products_status_created_at_id': ['status', 'created_at', 'id'],
+    'ix_products_status_product_name_id': ['status', 'product_name', 'id'],
+    'ix_products_status_category_created_at_id': ['status', 'category', 'created_at', 'id'],
+    'ix_products_status_product_type_created_at_id': ['status', 'product_type', 'created_at', 'id'],
+}
+
+
+def upgrade():
+    for name in PRODUCT_INDEXES:
+        op.drop_index(name, table_name='products')
+
+
+def downgrade():
+    for name, columns in PRODUCT_INDEXES.items():
+        op.create_index(name, 'products', columns)
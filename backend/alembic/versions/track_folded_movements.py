@@ -0,0 +1,51 @@
+"""track folded inventory movements
+
+Revision ID: track_folded_movements
+Revises: drop_product_status_indexes
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'track_folded_movements'
+down_revision = 'drop_product_status_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Snapshots mark each movement they fold instead of keeping an id high-water mark,
+    # which skipped movements committed after later ones had been folded
+    op.add_column('inventory_movements', sa.Column('folded_at', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE inventory_movements SET folded_at = coalesce((
+            SELECT v.stock_snapshot_at FROM product_variants v WHERE v.id = inventory_movements.variant_id
+        ), CURRENT_TIMESTAMP)
+        WHERE id <= (
+            SELECT v.stock_movement_id FROM product_variants v WHERE v.id = inventory_movements.variant_id
+        )
+    """)
+    op.create_index('ix_inventory_movements_unfolded', 'inventory_movements', ['variant_id'],
+                    postgresql_where=sa.text('folded_at IS NULL'), sqlite_where=sa.text('folded_at IS NULL'))
+    op.drop_column('product_variants', 'stock_movement_id')
+
+
+def downgrade():
+    # Fold the outstanding movements, then put the high-water mark back above all of them
+    op.add_column('product_variants', sa.Column('stock_movement_id', sa.Integer(), nullable=False,
+                                                server_default='0'))
+    op.execute("""
+        UPDATE product_variants SET
+            stock = coalesce(stock, 0) + coalesce((
+                SELECT sum(m.quantity) FROM inventory_movements m
+                WHERE m.variant_id = product_variants.id AND m.folded_at IS NULL
+            ), 0),
+            stock_movement_id = coalesce((
+                SELECT max(m.id) FROM inventory_movements m WHERE m.variant_id = product_variants.id
+            ), 0)
+    """)
+    op.drop_index('ix_inventory_movements_unfolded', table_name='inventory_movements')
+    op.drop_column('inventory_movements', 'folded_at')
@@ -7,6 +7,7 @@ from config.database import SessionLocal
 from apps.cart.models import Cart, CartItem
 from apps.products.models import Product, ProductVariant
 from apps.orders.services import OrderService
+from apps.products.inventory import InventoryService
 
 
 class CartService:
@@ -165,6 +166,9 @@ class CartService:
             if not cart or not cart.items:
                 raise HTTPException(status_code=400, detail="Cart is empty")
 
+            product_ids = sorted({item.product_id for item in cart.items if item.variant_id})
+
+            # reserves stock for every line, 409 if any is short
             order = OrderService.create_from_cart(
                 session=session,
                 user_id=user_id,
@@ -179,11 +183,14 @@ class CartService:
             # 🔥 SINGLE COMMIT POINT
             session.commit()
 
-            return {
+            result = {
                 "order_id": order.id,
                 "status": order.status,
                 "payment": "mock_success",
             }
+            # stock changed: rebuild listing rows / drop cached variants (uses its own session)
+            InventoryService.refresh(product_ids)
+            return result
 
         except Exception:
             session.rollback()
@@ -0,0 +1,174 @@
+"""
+Response compression.
+
+`CompressionMiddleware` compresses responses with the best encoding the client accepts
+(`br` when the `brotli` package is installed, then `gzip`), for content types in
+`COMPRESSION_CONTENT_TYPES` and bodies of at least `COMPRESSION_MIN_SIZE` bytes.
+Streaming responses are compressed chunk by chunk. Responses that already carry a
+`Content-Encoding` (e.g. precompressed cache entries, see `Cache.remember_compressed`)
+are passed through.
+"""
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# levels for entries compressed once and cached, where ratio matters more than speed
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 9
+
+
+class Compression:
+
+    @staticmethod
+    def encodings() -> tuple[str, ...]:
+        """Supported encodings, preferred first."""
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    @classmethod
+    def negotiate(cls, accept_encoding: str | None) -> str | None:
+        """Pick the preferred supported encoding with the highest q-value, or None."""
+
+        if not accept_encoding:
+            return None
+        weights = {}
+        for part in accept_encoding.split(','):
+            name, _, params = part.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            weights[name.strip().lower()] = quality
+
+        best, best_quality = None, 0.0
+        for encoding in cls.encodings():
+            quality = weights.get(encoding, weights.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    @staticmethod
+    def compressible(content_type: str | None) -> bool:
+        media_type = (content_type or '').split(';')[0].strip().lower()
+        return media_type in settings.COMPRESSION_CONTENT_TYPES
+
+    @staticmethod
+    def compress(data: bytes, encoding: str, cached: bool = False) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(
+                data, quality=CACHED_BROTLI_QUALITY if cached else settings.COMPRESSION_BROTLI_QUALITY)
+        return gzip.compress(data, compresslevel=CACHED_GZIP_LEVEL if cached else settings.COMPRESSION_GZIP_LEVEL)
+
+    @staticmethod
+    def compressor(encoding: str):
+        """
+        Incremental compressor with `process(chunk)` and `finish()`. Every chunk is
+        flushed, so streamed output (e.g. an export's first rows) isn't held back
+        until the compressor's buffers fill.
+        """
+
+        if encoding == 'br':
+            return _BrotliCompressor()
+        return _GzipCompressor()
+
+
+class _GzipCompressor:
+
+    def __init__(self):
+        # wbits 31: gzip header and trailer
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        if not data:
+            return b''
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def process(self, data: bytes) -> bytes:
+        if not data:
+            return b''
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = Compression.negotiate(Headers(scope=scope).get('accept-encoding'))
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+
+            if message['type'] == 'http.response.start':
+                # held back until the first body chunk tells whether to compress
+                start = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            if start is not None:
+                headers = MutableHeaders(raw=start['headers'])
+                body = message.get('body', b'')
+                more_body = message.get('more_body', False)
+                eligible = (
+                    start['status'] >= 200 and start['status'] not in (204, 304)
+                    and 'content-encoding' not in headers
+                    and Compression.compressible(headers.get('content-type'))
+                )
+                if eligible and 'accept-encoding' not in headers.get('vary', '').lower():
+                    headers.add_vary_header('Accept-Encoding')
+                # responses passed through `@app.middleware` arrive in chunks, with their Content-Length
+                size = len(body) if not more_body else int(headers.get('content-length') or -1)
+                if eligible and encoding and (size < 0 or size >= settings.COMPRESSION_MIN_SIZE):
+                    headers['Content-Encoding'] = encoding
+                    if more_body:
+                        del headers['Content-Length']
+                        compressor = Compression.compressor(encoding)
+                        message = {**message, 'body': compressor.process(body)}
+                    else:
+                        body = Compression.compress(body, encoding)
+                        headers['Content-Length'] = str(len(body))
+                        message = {**message, 'body': body}
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            if compressor is not None:
+                chunk = compressor.process(message.get('body', b''))
+                if not message.get('more_body', False):
+                    chunk += compressor.finish()
+                message = {**message, 'body': chunk}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+
+class ConditionalGet:
+    """
+    Helpers for answering `If-None-Match` / `If-Modified-Since` with 304 Not Modified.
+
+    Database timestamps are naive and treated as UTC.
+    """
+
+    @staticmethod
+    def etag(*parts) -> str:
+        """Build a strong ETag from the given version parts."""
+        digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+        return f'"{digest}"'
+
+    @staticmethod
+    def http_date(timestamp: float) -> str:
+        return format_datetime(datetime.fromtimestamp(timestamp, tz=timezone.utc), usegmt=True)
+
+    @staticmethod
+    def timestamp(value: datetime | None) -> float | None:
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+
+    @classmethod
+    def is_not_modified(cls, request: Request, etag: str, last_modified: float | None) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                return True
+            candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return etag in candidates
+
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since and last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            # HTTP dates have one-second resolution
+            return int(last_modified) <= since.timestamp()
+
+        return False
+
+    @classmethod
+    def evaluate(cls, request: Request, response: Response, etag: str, last_modified: float | None):
+        """
+        Attach validators to `response` and return a 304 response if the client's
+        copy is still current, otherwise None so the handler builds the full body.
+        """
+
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if last_modified is not None:
+            headers['Last-Modified'] = cls.http_date(last_modified)
+
+        if cls.is_not_modified(request, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+        return None
@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from fastapi import HTTPException, status
+
+
+class Cursor:
+    """
+    Opaque keyset-pagination cursor.
+
+    A cursor holds the sort value and the id of the last row of a page, so the
+    next page can be fetched with `WHERE (sort_value, id) > (last_value, last_id)`
+    instead of an OFFSET. It is sent to clients as url-safe base64 JSON.
+    """
+
+    @classmethod
+    def encode(cls, sort: str, value, pk: int) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        payload = json.dumps([sort, value, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, cursor: str, sort: str, value_type: type) -> tuple:
+        """
+        Return `(value, pk)` from a cursor created by `encode` for the same `sort`.
+        Raise 400 if the cursor is malformed or was issued for another sort order.
+        """
+
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if cursor_sort != sort or not isinstance(pk, int):
+                raise ValueError
+            if value is not None:
+                if value_type is datetime:
+                    value = datetime.fromisoformat(value)
+                elif value_type is Decimal:
+                    value = Decimal(value)
+                else:
+                    value = value_type(value)
+        except (ValueError, TypeError, InvalidOperation, json.JSONDecodeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+        return value, pk
@@ -0,0 +1,61 @@
+"""
+Fast JSON responses.
+
+`FastJSONResponse` encodes with orjson when it is installed (stdlib json otherwise),
+handling Decimal, datetime and date itself. Returning one from an endpoint skips FastAPI's
+response-model validation and `jsonable_encoder`, so it is opt-in, for endpoints whose
+payload the service layer builds in the documented shape. Content that is already
+encoded (`bytes`, e.g. cached payloads) is sent as is.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Compact JSON encoding of `value`."""
+
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_array(items) -> bytes:
+    """JSON array of already encoded items."""
+
+    return b'[' + b','.join(items) + b']'
+
+
+def json_object(members: dict) -> bytes:
+    """JSON object of `{key: already encoded value}`."""
+
+    return b'{' + b','.join(dumps(key) + b':' + value for key, value in members.items()) + b'}'
+
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
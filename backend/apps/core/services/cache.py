@@ -0,0 +1,280 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from apps.core.compression import Compression
+from apps.core.responses import dumps, loads
+from config import settings
+
+
+class CacheBackend(ABC):
+    """
+    Byte-oriented key/value store used by `Cache`.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int):
+        pass
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, values: dict[str, bytes], ttl: int):
+        for key, value in values.items():
+            self.set(key, value, ttl)
+
+    def size(self) -> int | None:
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU cache with per-entry TTL.
+    Each worker process holds its own copy, so invalidations only reach the process that made them.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int | None:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared cache for deployments running more than one worker.
+    Requires the `redis` package and `REDIS_URL`.
+    """
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the `redis` package.") from exc
+        if not url:
+            raise RuntimeError("CACHE_BACKEND=redis requires REDIS_URL to be set.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def set_many(self, values: dict[str, bytes], ttl: int):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(self.prefix + key, value, ex=ttl)
+        pipeline.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class Cache:
+    """
+    Namespaced view over a `CacheBackend` that stores JSON-serialized payloads
+    and counts hits, misses and invalidations.
+    """
+
+    def __init__(self, namespace: str, backend: CacheBackend, ttl: int):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> bytes | None:
+        value = self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: int | None = None):
+        self.backend.set(self._key(key), value, ttl or self.ttl)
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        """Values of `keys`, in order, in one backend round trip."""
+
+        values = self.backend.get_many([self._key(key) for key in keys])
+        found = sum(value is not None for value in values)
+        self.hits += found
+        self.misses += len(values) - found
+        return values
+
+    def set_many(self, values: dict[str, bytes], ttl: int | None = None):
+        if values:
+            self.backend.set_many({self._key(key): value for key, value in values.items()}, ttl or self.ttl)
+
+    def delete(self, *keys: str):
+        self.invalidations += len(keys)
+        self.backend.delete(*[self._key(key) for key in keys])
+
+    def version(self, name: str) -> str:
+        """
+        Current value of a version counter. Embed it in keys of entries that
+        depend on many rows, so `bump_version` invalidates all of them at once.
+        """
+
+        key = self._key(f"version:{name}")
+        value = self.backend.get(key)
+        if value is None:
+            value = str(time.time_ns()).encode()
+            self.backend.set(key, value, VERSION_TTL)
+        return value.decode()
+
+    def bump_version(self, name: str):
+        self.invalidations += 1
+        self.backend.set(self._key(f"version:{name}"), str(time.time_ns()).encode(), VERSION_TTL)
+
+    @staticmethod
+    def dumps(value) -> bytes:
+        return dumps(value)
+
+    def remember(self, key: str, loader):
+        """
+        Return the cached value of `key`, or call `loader()`, cache its result and return it.
+        """
+
+        cached = self.get(key)
+        if cached is not None:
+            return loads(cached)
+        value = loader()
+        self.set(key, self.dumps(value))
+        return value
+
+    def remember_encoded(self, key: str, loader) -> bytes:
+        """
+        Like `remember`, but return the cached JSON bytes, for responses that send them as is.
+        """
+
+        cached = self.get(key)
+        if cached is None:
+            cached = self.dumps(loader())
+            self.set(key, cached)
+        return cached
+
+    def remember_compressed(self, key: str, encode, encoding: str | None) -> tuple[bytes, str | None]:
+        """
+        Return the bytes cached under `key` (built with `encode()` on a miss) compressed
+        with `encoding`, and the encoding actually applied: None when no encoding was
+        asked for or the payload is under `COMPRESSION_MIN_SIZE`. Each compressed variant
+        is cached under `{key}.{encoding}`, so hits don't pay for compression again;
+        invalidate with `compressed_keys`.
+        """
+
+        if encoding is not None:
+            cached = self.get(f"{key}.{encoding}")
+            if cached is not None:
+                return cached, encoding
+
+        data = self.get(key)
+        if data is None:
+            data = encode()
+            self.set(key, data)
+        if encoding is None or len(data) < settings.COMPRESSION_MIN_SIZE:
+            return data, None
+
+        compressed = Compression.compress(data, encoding, cached=True)
+        self.set(f"{key}.{encoding}", compressed)
+        return compressed, encoding
+
+    @staticmethod
+    def compressed_keys(key: str) -> list[str]:
+        """`key` and the keys of its compressed variants."""
+        return [key] + [f"{key}.{encoding}" for encoding in Compression.encodings()]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "size": self.backend.size(),
+        }
+
+
+# version counters outlive the entries they key
+VERSION_TTL = 30 * 24 * 3600
+
+_backend: CacheBackend | None = None
+_caches: dict[str, Cache] = {}
+
+
+def get_cache_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "redis":
+            _backend = RedisCacheBackend(settings.REDIS_URL)
+        else:
+            _backend = MemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    return _backend
+
+
+def get_cache(namespace: str) -> Cache:
+    if namespace not in _caches:
+        _caches[namespace] = Cache(namespace, get_cache_backend(), settings.CACHE_TTL_SECONDS)
+    return _caches[namespace]
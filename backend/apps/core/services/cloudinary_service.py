@@ -1,12 +1,19 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+import cloudinary.utils
 
 from fastapi import UploadFile
+
+from apps.core.services.image_processing import ImageProcessor
 from config.settings import (
     CLOUDINARY_CLOUD_NAME,
     CLOUDINARY_API_KEY,
     CLOUDINARY_API_SECRET,
+    CLOUDINARY_UPLOAD_WORKERS,
 )
 
 cloudinary.config(
@@ -16,6 +23,9 @@ cloudinary.config(
     secure=True,
 )
 
+# shared by all requests, so concurrent uploads stay bounded process-wide
+_upload_pool = ThreadPoolExecutor(max_workers=CLOUDINARY_UPLOAD_WORKERS, thread_name_prefix="cloudinary-upload")
+
 
 class CloudinaryService:
     """
@@ -23,13 +33,24 @@ class CloudinaryService:
     """
 
     @staticmethod
-    def upload_image(file: UploadFile, folder: str) -> dict:
+    def upload_image(file: UploadFile, folder: str, find_existing=None) -> dict:
         """
-        Upload image to Cloudinary
+        Upload image to Cloudinary, after `ImageProcessor.prepare`
+
+        `find_existing(fingerprint)` (see `ImageProcessor.fingerprint`) may return an
+        earlier upload result of the same image; that result is returned (with
+        `"reused": True`) and nothing is uploaded.
         """
 
+        prepared, phash = ImageProcessor.prepare(file.file)
+        fingerprint = ImageProcessor.fingerprint(prepared, phash)
+        if find_existing is not None:
+            existing = find_existing(fingerprint)
+            if existing is not None:
+                return {**existing, "reused": True}
+
         result = cloudinary.uploader.upload(
-            file.file,
+            prepared,
             folder=folder,
             resource_type="image",
         )
@@ -39,8 +60,97 @@ class CloudinaryService:
             "secure_url": result["secure_url"],
             "public_id": result["public_id"],
             "format": result["format"],
+            "width": result.get("width"),
+            "height": result.get("height"),
+            "bytes": result.get("bytes"),
+            "phash": phash,
+            "content_hash": fingerprint["content_hash"],
+            "reused": False,
         }
 
+    @classmethod
+    def upload_images(cls, files: list[UploadFile], folder: str, find_existing=None) -> list[dict]:
+        """
+        Upload several images concurrently on the shared upload pool.
+
+        Returns one result per file, in the order given:
+        `{"filename", "upload"}` on success or `{"filename", "error"}` on failure,
+        so one bad file doesn't fail the others.
+        """
+
+        futures = [_upload_pool.submit(cls.upload_image, file, folder, find_existing) for file in files]
+
+        results = []
+        for file, future in zip(files, futures):
+            try:
+                results.append({"filename": file.filename, "upload": future.result()})
+            except Exception as exc:
+                results.append({"filename": file.filename, "error": str(getattr(exc, "detail", exc))})
+        return results
+
+    @staticmethod
+    def sign_upload(folder: str) -> dict:
+        """
+        Signed parameters for a browser upload straight to Cloudinary, restricted to `folder`.
+        Cloudinary rejects the signature once `timestamp` is more than an hour old.
+        """
+
+        params = {"folder": folder, "timestamp": int(time.time())}
+        return {
+            **params,
+            "signature": cloudinary.utils.api_sign_request(params, CLOUDINARY_API_SECRET),
+            "api_key": CLOUDINARY_API_KEY,
+            "cloud_name": CLOUDINARY_CLOUD_NAME,
+            "upload_url": f"https://api.cloudinary.com/v1_1/{CLOUDINARY_CLOUD_NAME}/image/upload",
+        }
+
+    @staticmethod
+    def verify_upload(public_id: str, version: int | str, signature: str) -> bool:
+        """
+        Check the `signature` Cloudinary returned with an upload response.
+        """
+
+        return cloudinary.utils.verify_api_response_signature(public_id, version, signature)
+
+    @staticmethod
+    def image_details(public_id: str) -> dict:
+        """
+        Stored `version`, `format`, dimensions and size of an uploaded image, from the
+        Admin API. Raises `cloudinary.exceptions.NotFound` if there is no such image.
+        """
+
+        result = cloudinary.api.resource(public_id, resource_type="image")
+        return {
+            "version": result["version"],
+            "format": result["format"],
+            "width": result.get("width"),
+            "height": result.get("height"),
+            "bytes": result.get("bytes"),
+        }
+
+    @staticmethod
+    def image_url(public_id: str, version: int | str, format: str) -> str:
+        return cloudinary.utils.cloudinary_url(public_id, version=version, format=format, secure=True)[0]
+
+    @staticmethod
+    def responsive_urls(public_id: str, widths: list[int], max_width: int | None = None) -> list[dict]:
+        """
+        Delivery URLs of `public_id` resized to each of `widths`, with automatic format
+        and quality (`f_auto,q_auto`). Widths above `max_width` (the original) are skipped,
+        Cloudinary would only upscale them. Empty when Cloudinary isn't configured (local runs).
+        """
+
+        if not CLOUDINARY_CLOUD_NAME:
+            return []
+        return [
+            {
+                "width": width,
+                "url": cloudinary.utils.cloudinary_url(
+                    public_id, width=width, crop="limit", fetch_format="auto", quality="auto", secure=True)[0],
+            }
+            for width in widths if max_width is None or width <= max_width
+        ]
+
     @staticmethod
     def delete_image(public_id: str) -> bool:
         """
@@ -50,3 +160,36 @@ class CloudinaryService:
         result = cloudinary.uploader.destroy(public_id)
 
         return result.get("result") == "ok"
+
+    @staticmethod
+    def list_images(prefix: str, page_size: int = 500):
+        """
+        Yield pages of `{"public_id", "created_at", "bytes"}` for every uploaded
+        image whose public id starts with `prefix`, until the cursor runs out.
+        The Admin API doesn't promise any order for prefix listings.
+        """
+
+        next_cursor = None
+        while True:
+            result = cloudinary.api.resources(
+                type="upload", resource_type="image", prefix=prefix,
+                max_results=page_size, **({"next_cursor": next_cursor} if next_cursor else {}),
+            )
+            yield [
+                {"public_id": resource["public_id"], "created_at": resource["created_at"], "bytes": resource.get("bytes")}
+                for resource in result.get("resources", [])
+            ]
+            next_cursor = result.get("next_cursor")
+            if not next_cursor:
+                return
+
+    @staticmethod
+    def delete_images(public_ids: list[str]) -> dict:
+        """
+        Delete up to 100 images from Cloudinary in one Admin API call.
+        Returns `{public_id: status}`, where status is "deleted" or "not_found" on success.
+        """
+
+        result = cloudinary.api.delete_resources(public_ids, resource_type="image")
+
+        return result.get("deleted", {})
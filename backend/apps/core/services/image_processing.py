@@ -0,0 +1,121 @@
+import hashlib
+import io
+
+from fastapi import HTTPException, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ImageProcessor:
+    """
+    Prepares uploaded images before they are sent to Cloudinary: enforces
+    `MAX_FILE_SIZE` (MB), applies the EXIF orientation, downsizes to
+    `IMAGE_MAX_DIMENSION`, re-encodes without EXIF/XMP metadata and computes
+    a perceptual hash for duplicate detection.
+    """
+
+    @staticmethod
+    def read_limited(file, max_bytes: int) -> bytes:
+        """
+        Read `file` in chunks, failing as soon as it grows past `max_bytes`
+        instead of buffering the whole upload first.
+        """
+
+        buffer = io.BytesIO()
+        while chunk := file.read(CHUNK_SIZE):
+            buffer.write(chunk)
+            if buffer.tell() > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Image is larger than {settings.MAX_FILE_SIZE} MB.")
+        return buffer.getvalue()
+
+    @staticmethod
+    def dhash(image: Image.Image) -> str:
+        """
+        64-bit difference hash as 16 hex digits: each bit tells whether a pixel of the
+        9x8 grayscale thumbnail is brighter than its right neighbour. Re-encoded, resized
+        or slightly retouched copies of an image land within a few bits of each other.
+        """
+
+        pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return f"{bits:016x}"
+
+    @staticmethod
+    def hash_distance(first: str, second: str) -> int:
+        return (int(first, 16) ^ int(second, 16)).bit_count()
+
+    @staticmethod
+    def hash_chunks(phash: str, max_distance: int) -> list[tuple[int, str]]:
+        """
+        Split a dhash into `max_distance + 1` `(offset, hex digits)` pieces. Hashes within
+        `max_distance` bits of each other share at least one piece (pigeonhole), so the
+        pieces can bucket candidates before the exact distance is computed.
+        """
+
+        pieces = min(max_distance + 1, len(phash))
+        bounds = [len(phash) * index // pieces for index in range(pieces + 1)]
+        return [(start, phash[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+    @staticmethod
+    def fingerprint(prepared: io.BytesIO, phash: str) -> dict:
+        """Duplicate lookup keys of a prepared image: its dhash, SHA-256 and dimensions."""
+
+        data = prepared.getvalue()
+        width, height = Image.open(io.BytesIO(data)).size
+        return {
+            'phash': phash,
+            'content_hash': hashlib.sha256(data).hexdigest(),
+            'width': width,
+            'height': height,
+        }
+
+    @classmethod
+    def prepare(cls, file) -> tuple[io.BytesIO, str]:
+        """
+        Return the processed image as an in-memory file, with its `dhash`. Animated
+        images are only size-checked and hashed, re-encoding would drop their frames.
+        """
+
+        data = cls.read_limited(file, settings.MAX_FILE_SIZE * 1024 * 1024)
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            animated = getattr(image, 'n_frames', 1) > 1
+            max_dimension = settings.IMAGE_MAX_DIMENSION
+            # JPEG can decode straight at a reduced scale, much cheaper than a full decode
+            image.draft('RGB', (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(image)
+            image_hash = cls.dhash(image)
+            if animated or not settings.IMAGE_PREPROCESSING:
+                return io.BytesIO(data), image_hash
+
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file.") from exc
+
+        output_format = settings.IMAGE_OUTPUT_FORMAT.upper()
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        if output_format == 'JPEG' and has_alpha:
+            # JPEG can't hold transparency
+            output_format = 'WEBP'
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        output = io.BytesIO()
+        # only the colour profile is carried over; EXIF, XMP and comments are dropped
+        image.save(
+            output,
+            format=output_format,
+            quality=settings.IMAGE_QUALITY,
+            icc_profile=image.info.get('icc_profile'),
+            **({'optimize': True, 'progressive': True} if output_format == 'JPEG' else {'method': 4}),
+        )
+        output.seek(0)
+        return output, image_hash
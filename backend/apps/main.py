@@ -1,8 +1,10 @@
 # apps/main.py
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from apps.core.compression import CompressionMiddleware
 from config.routers import RouterManager
 from config.database import SessionLocal
 
@@ -25,6 +27,9 @@ async def db_session_middleware(request: Request, call_next):
         # Clean up scoped session after each request to prevent stale connections
         SessionLocal.remove()
 
+# ✅ gzip / brotli, negotiated from Accept-Encoding (settings: COMPRESSION_*)
+app.add_middleware(CompressionMiddleware)
+
 # ✅ CORS FIX
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +51,30 @@ def startup_event():
     RouterManager(app).import_routers()
     logger.info("Routers loaded successfully.")
 
+@app.on_event("startup")
+async def start_media_deletion_queue():
+    # retries Cloudinary deletions that failed or were queued by a worker that died
+    from apps.products.media_cleanup import MediaDeletionQueue
+    app.state.media_deletion_task = asyncio.create_task(MediaDeletionQueue.run_periodically())
+
+@app.on_event("startup")
+async def start_temp_media_sweeper():
+    # deletes wizard uploads (products/temp) that never got attached to a product
+    from apps.products.media_cleanup import TempMediaSweeper
+    app.state.temp_media_task = asyncio.create_task(TempMediaSweeper.run_periodically())
+
+@app.on_event("startup")
+async def start_inventory_snapshots():
+    # folds the inventory ledger into per-variant snapshots so stock reads stay short
+    from apps.products.inventory import InventoryService
+    app.state.inventory_snapshot_task = asyncio.create_task(InventoryService.run_periodically())
+
+@app.on_event("shutdown")
+async def stop_media_deletion_queue():
+    app.state.media_deletion_task.cancel()
+    app.state.temp_media_task.cancel()
+    app.state.inventory_snapshot_task.cancel()
+
 @app.get("/")
 def health():
     return {"status": "ok"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Numeric, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Numeric, String, ForeignKey, DateTime, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import FastModel
@@ -11,6 +11,8 @@ class Order(FastModel):
     address_id = Column(Integer, nullable=False)
     total_amount = Column(Numeric(10, 2), nullable=False)
     status = Column(String, default="PLACED")
+    # whether the items' quantities are currently taken from variant stock
+    stock_reserved = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, server_default=func.now())
 
     items = relationship("OrderItem", back_populates="order")
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from apps.core.responses import FastJSONResponse
 from apps.orders.services import OrderService
 from apps.accounts.dependencies import get_current_user, require_superuser
 from pydantic import BaseModel
@@ -10,9 +11,9 @@ class OrderStatusUpdate(BaseModel):
     status: str
 
 
-@router.get("/")
+@router.get("/", response_class=FastJSONResponse)
 def list_my_orders(user=Depends(get_current_user)):
-    return OrderService.get_user_orders(user.id)
+    return FastJSONResponse(OrderService.get_user_orders(user.id))
 
 
 @router.get("/{order_id}")
@@ -26,15 +27,16 @@ def update_order_status(order_id: int, payload: OrderStatusUpdate, user=Depends(
     return OrderService.update_order_status(user.id, order_id, payload.status, is_user=True)
 
 
-@router.get("/admin/allorders")
+@router.get("/admin/allorders", response_class=FastJSONResponse)
 def get_all_orders(admin=Depends(require_superuser)):
-    return OrderService.get_all_success_orders()
+    # large payload: encoded directly, without jsonable_encoder
+    return FastJSONResponse(OrderService.get_all_success_orders())
 
 
-@router.get("/admin/analytics")
+@router.get("/admin/analytics", response_class=FastJSONResponse)
 def get_analytics(admin=Depends(require_superuser)):
     """Get comprehensive analytics for admin dashboard"""
-    return OrderService.get_analytics()
+    return FastJSONResponse(OrderService.get_analytics())
 
 
 @router.get("/admin/{order_id}")
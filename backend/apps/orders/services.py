@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 
 from apps.orders.models import Order, OrderItem
 from apps.payments.models import Payment
+from apps.products.inventory import InventoryService
 from config.database import SessionLocal
 
 # Order Status Constants
@@ -113,10 +114,14 @@ class OrderService:
             address_id=address_id,
             status="PLACED" if mock_payment else "PENDING",
             total_amount=Decimal("0.00"),
+            stock_reserved=True,
         )
         session.add(order)
         session.flush()
 
+        # Reserve stock for every line (409 if any is short; caller rolls back)
+        InventoryService.reserve(session, [(item.variant_id, item.quantity) for item in cart.items], order.id)
+
         # 2️⃣ Order Items
         for item in cart.items:
             price = (
@@ -272,12 +277,25 @@ class OrderService:
             # Validate status
             if new_status.upper() not in VALID_ORDER_STATUSES:
                 raise HTTPException(status_code=400, detail=f"Invalid order status: {new_status}")
-            
+
+            # Cancelling gives the stock back; reopening a cancelled order takes it again
+            lines = [(item.variant_id, item.quantity) for item in order.items]
+            product_ids = []
+            if new_status.upper() == "CANCELLED" and order.stock_reserved:
+                product_ids = InventoryService.release(session, lines, order.id)
+                order.stock_reserved = False
+            elif order.status == "CANCELLED" and new_status.upper() != "CANCELLED" and not order.stock_reserved:
+                product_ids = InventoryService.reserve(session, lines, order.id)
+                order.stock_reserved = True
+
             order.status = new_status.upper()
             session.commit()
             session.refresh(order)
-            
-            return OrderService._serialize(order)
+
+            serialized = OrderService._serialize(order)
+            # after the order work: the refresh uses (and closes) this thread's scoped session
+            InventoryService.refresh(product_ids)
+            return serialized
 
     @staticmethod
     def get_analytics():
@@ -0,0 +1,87 @@
+"""
+Streaming catalog export (NDJSON / CSV).
+
+Product ids are read through a server-side cursor (`stream_results` / `yield_per`) on a
+dedicated connection. Each partition is hydrated with `ProductService.retrieve_products`
+and written out straight away, so memory stays flat however large the catalog is.
+
+NDJSON: one `retrieve_product` payload per line.
+CSV: one row per variant, options resolved to their names; the product's media URLs
+     (`|`-separated) are on the first row of each product.
+"""
+import csv
+import io
+
+from sqlalchemy import select
+
+from apps.core.responses import dumps
+from apps.products.models import Product
+from apps.products.services import ProductService
+from config import settings
+from config.database import engine
+
+CSV_COLUMNS = [
+    'product_id', 'product_name', 'description', 'ingredients', 'how_to_use', 'category', 'product_type',
+    'status', 'variant_id', 'option1_name', 'option1_value', 'option2_name', 'option2_value',
+    'option3_name', 'option3_value', 'price', 'stock', 'media',
+]
+
+
+class CatalogExporter:
+
+    def __init__(self, status: str | None = None, batch_size: int | None = None):
+        self.status = status
+        self.batch_size = batch_size or settings.catalog_export_batch_size
+
+    def products(self):
+        """
+        Yield product payloads, hydrating one `batch_size` partition of the cursor at a time.
+        """
+
+        query = select(Product.id).order_by(Product.id)
+        if self.status is not None:
+            query = query.where(Product.status == self.status)
+
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=self.batch_size).execute(query)
+            for partition in result.partitions():
+                yield from ProductService.retrieve_products([row[0] for row in partition])
+
+    def ndjson(self):
+        for product in self.products():
+            yield dumps(product) + b'\n'
+
+    def csv(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for product in self.products():
+            for row in self._csv_rows(product):
+                writer.writerow(row)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        # header only, when the catalog is empty
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def _csv_rows(product: dict):
+        options = product['options'] or []
+        item_names = {item['item_id']: item['item_name'] for option in options for item in option['items']}
+        base = {column: product.get(column) for column in CSV_COLUMNS[:8]}
+        for position, option in enumerate(options[:3], start=1):
+            base[f'option{position}_name'] = option['option_name']
+
+        media = '|'.join(media['src'] for media in product['media'] or [])
+        for index, variant in enumerate(product['variants'] or [{}]):
+            row = dict(base)
+            row.update({
+                'variant_id': variant.get('variant_id'),
+                'price': variant.get('price'),
+                'stock': variant.get('stock'),
+                'media': media if index == 0 else None,
+            })
+            for position in (1, 2, 3):
+                row[f'option{position}_value'] = item_names.get(variant.get(f'option{position}'))
+            yield row
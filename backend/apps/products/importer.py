@@ -0,0 +1,318 @@
+"""
+Streaming catalog import (CSV / JSONL).
+
+JSONL: one product per line, shaped like `schemas.ImportProductIn`:
+    {"handle": "royal-oud", "product_name": "Royal Oud Attar", ...,
+     "options": [{"option_name": "Size", "items": ["6ml", "12ml"]}],
+     "variants": [{"sku": "RO-6", "option1": "6ml", "price": 499, "stock": 20, "images": [...]}],
+     "product_images": [{"src": "...", "cloudinary_id": "..."}]}
+
+CSV: one variant per row; consecutive rows with the same `handle` form one product.
+    handle, product_name, description, ingredients, how_to_use, category, product_type, status,
+    option1_name, option1_value, option2_name, option2_value, option3_name, option3_value,
+    sku, price, stock, image_src, image_cloudinary_id, image_alt
+
+Products are upserted by `handle`, variants by `sku`, option items by (option, name), and media
+that is already linked to the product (same `cloudinary_id`) is skipped. Stock is recorded in the
+inventory ledger: a receipt for new variants, an adjustment to the imported level for existing ones.
+Products left without any variant get a default one (price 0, no stock), like products created
+through the API.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import groupby
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+
+from apps.products.inventory import InventoryService, RECEIPT
+from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia
+from apps.products.schemas import ImportProductIn
+from apps.products.services import ProductService, upsert
+from config import settings
+from config.database import SessionLocal
+
+# rows per multi-row INSERT, keeps statements under the drivers' bind-parameter limits
+STATEMENT_ROWS = 1000
+
+
+@dataclass
+class BatchReport:
+    batch: int
+    products: int = 0
+    variants: int = 0
+    media: int = 0
+    errors: list = field(default_factory=list)
+
+
+class CatalogImporter:
+
+    def __init__(self, batch_size: int | None = None, on_batch=None):
+        self.batch_size = batch_size or settings.catalog_import_batch_size
+        self.on_batch = on_batch
+
+    # --------------
+    # --- Readers ---
+    # --------------
+
+    @staticmethod
+    def read_jsonl(file):
+        for line_no, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_no, exc
+
+    @staticmethod
+    def read_csv(file):
+        reader = csv.DictReader(file)
+        numbered = ((reader.line_num, row) for row in reader)
+        for handle, group in groupby(numbered, key=lambda numbered_row: numbered_row[1].get('handle')):
+            rows = list(group)
+            line_no, first = rows[0]
+            options = []
+            for position in (1, 2, 3):
+                name = (first.get(f'option{position}_name') or '').strip()
+                if name:
+                    values = []
+                    for _, row in rows:
+                        value = row.get(f'option{position}_value')
+                        if value and value not in values:
+                            values.append(value)
+                    options.append({'option_name': name, 'items': values})
+
+            variants = []
+            for _, row in rows:
+                variant = {
+                    'sku': row.get('sku'),
+                    'price': row.get('price') or 0,
+                    'stock': row.get('stock') or 0,
+                    'images': [],
+                }
+                for position in (1, 2, 3):
+                    variant[f'option{position}'] = row.get(f'option{position}_value') or None
+                if row.get('image_src'):
+                    variant['images'].append({
+                        'src': row['image_src'],
+                        'cloudinary_id': row.get('image_cloudinary_id') or row['image_src'],
+                        'alt': row.get('image_alt') or None,
+                    })
+                variants.append(variant)
+
+            yield line_no, {
+                'handle': handle,
+                'product_name': first.get('product_name'),
+                'description': first.get('description') or None,
+                'ingredients': first.get('ingredients') or None,
+                'how_to_use': first.get('how_to_use') or None,
+                'category': first.get('category') or None,
+                'product_type': first.get('product_type') or None,
+                'status': first.get('status') or 'draft',
+                'options': options or None,
+                'variants': variants,
+            }
+
+    # ---------------
+    # --- Import ---
+    # ---------------
+
+    def run(self, documents):
+        """
+        Validate and upsert `(line_no, document)` pairs in batches.
+        Returns the list of per-batch reports; `on_batch` is called after each batch.
+        """
+
+        reports = []
+        batch, errors = [], []
+        for line_no, document in documents:
+            if isinstance(document, Exception):
+                errors.append({'line': line_no, 'error': str(document)})
+                continue
+            try:
+                batch.append((line_no, ImportProductIn.model_validate(document)))
+            except ValidationError as exc:
+                errors.append({'line': line_no, 'handle': document.get('handle'), 'error': exc.errors()})
+            if len(batch) >= self.batch_size:
+                reports.append(self._flush(len(reports) + 1, batch, errors))
+                batch, errors = [], []
+        if batch or errors:
+            reports.append(self._flush(len(reports) + 1, batch, errors))
+        return reports
+
+    def _flush(self, number: int, batch: list, errors: list) -> BatchReport:
+        report = BatchReport(batch=number, errors=errors)
+        if batch:
+            try:
+                product_ids = self._upsert_batch(batch, report)
+            except Exception as exc:
+                report.products = report.variants = report.media = 0
+                report.errors.extend({'line': line_no, 'handle': product.handle, 'error': f"batch failed: {exc}"}
+                                     for line_no, product in batch)
+            else:
+                ProductService.sync_listing(*product_ids)
+                for product_id in product_ids:
+                    ProductService.invalidate_cache(product_id)
+        if self.on_batch:
+            self.on_batch(report)
+        return report
+
+    def _upsert_batch(self, batch: list, report: BatchReport) -> list[int]:
+        # the last occurrence of a handle wins; ON CONFLICT can't touch a row twice in one statement
+        products = list({product.handle: product for _, product in batch}.values())
+        now = datetime.now()
+
+        with SessionLocal() as session:
+            try:
+                # --- products ---
+                statement = upsert(Product).values([
+                    {
+                        'handle': product.handle,
+                        'product_name': product.product_name,
+                        'description': product.description,
+                        'ingredients': product.ingredients,
+                        'how_to_use': product.how_to_use,
+                        'category': product.category,
+                        'product_type': product.product_type or 'perfume',
+                        'status': product.status if product.status in ('active', 'archived', 'draft') else 'draft',
+                    }
+                    for product in products
+                ])
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Product.handle],
+                    set_={column: statement.excluded[column] for column in (
+                        'product_name', 'description', 'ingredients', 'how_to_use',
+                        'category', 'product_type', 'status')} | {'updated_at': now},
+                ).returning(Product.handle, Product.id)
+                product_ids = dict(session.execute(statement).all())
+                report.products = len(product_ids)
+
+                # --- options ---
+                option_rows = [
+                    {'product_id': product_ids[product.handle], 'option_name': option.option_name}
+                    for product in products for option in product.options or []
+                ]
+                option_ids = {}
+                for chunk in self._chunks(option_rows):
+                    statement = upsert(ProductOption).values(chunk)
+                    # no-op update so RETURNING also yields rows that already existed
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[ProductOption.product_id, ProductOption.option_name],
+                        set_={'option_name': statement.excluded.option_name},
+                    ).returning(ProductOption.product_id, ProductOption.option_name, ProductOption.id)
+                    option_ids.update({(pid, name): oid for pid, name, oid in session.execute(statement)})
+
+                # --- option items ---
+                item_rows = [
+                    {'option_id': option_ids[(product_ids[product.handle], option.option_name)], 'item_name': item}
+                    for product in products for option in product.options or [] for item in dict.fromkeys(option.items)
+                ]
+                item_ids = {}
+                for chunk in self._chunks(item_rows):
+                    statement = upsert(ProductOptionItem).values(chunk)
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[ProductOptionItem.option_id, ProductOptionItem.item_name],
+                        set_={'item_name': statement.excluded.item_name},
+                    ).returning(ProductOptionItem.option_id, ProductOptionItem.item_name, ProductOptionItem.id)
+                    item_ids.update({(oid, name): iid for oid, name, iid in session.execute(statement)})
+
+                # --- variants ---
+                variant_rows, variant_stock, variant_images = {}, {}, {}
+                for product in products:
+                    product_id = product_ids[product.handle]
+                    # option values are item names of the product's options, in option order
+                    product_option_ids = [option_ids[(product_id, option.option_name)]
+                                          for option in product.options or []]
+                    for variant in product.variants or []:
+                        values = [variant.option1, variant.option2, variant.option3]
+                        row = {'sku': variant.sku, 'product_id': product_id, 'price': variant.price}
+                        for position, value in enumerate(values, start=1):
+                            option_id = product_option_ids[position - 1] if position <= len(product_option_ids) else None
+                            row[f'option{position}'] = item_ids.get((option_id, value)) if value else None
+                        variant_rows[variant.sku] = row
+                        variant_stock[variant.sku] = variant.stock
+                        variant_images[variant.sku] = (product_id, variant.images or [])
+
+                existing_skus = set()
+                for chunk in self._chunks(list(variant_rows)):
+                    existing_skus.update(session.scalars(select(ProductVariant.sku).where(ProductVariant.sku.in_(chunk))))
+
+                variant_ids = {}
+                for chunk in self._chunks(list(variant_rows.values())):
+                    statement = upsert(ProductVariant).values(chunk)
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[ProductVariant.sku],
+                        set_={column: statement.excluded[column] for column in (
+                            'product_id', 'price', 'option1', 'option2', 'option3')} | {'updated_at': now},
+                    ).returning(ProductVariant.sku, ProductVariant.id)
+                    variant_ids.update(dict(session.execute(statement).all()))
+
+                # --- default variants, as ProductService's create paths give products without any ---
+                with_variants = set(session.scalars(
+                    select(ProductVariant.product_id).where(ProductVariant.product_id.in_(product_ids.values()))))
+                default_rows = [{'product_id': product_id, 'price': 0}
+                                for product_id in product_ids.values() if product_id not in with_variants]
+                for chunk in self._chunks(default_rows):
+                    session.execute(insert(ProductVariant), chunk)
+                report.variants = len(variant_ids) + len(default_rows)
+
+                # --- stock, through the inventory ledger: receipts for new variants, adjustments otherwise ---
+                for chunk in self._chunks(list(variant_stock)):
+                    InventoryService.record(session, RECEIPT, {
+                        variant_ids[sku]: variant_stock[sku] for sku in chunk if sku not in existing_skus
+                    }, note="catalog import")
+                    InventoryService.set_stock(session, {
+                        variant_ids[sku]: variant_stock[sku] for sku in chunk if sku in existing_skus
+                    }, note="catalog import")
+
+                # --- media (insert only what isn't linked yet) ---
+                existing = set(session.execute(
+                    select(ProductMedia.product_id, ProductMedia.cloudinary_id)
+                    .where(ProductMedia.product_id.in_(product_ids.values()))
+                ).all())
+                media_rows = []
+                for sku, (product_id, images) in variant_images.items():
+                    media_rows.extend(self._media_rows(product_id, images, existing, variant_ids[sku]))
+                for product in products:
+                    media_rows.extend(self._media_rows(
+                        product_ids[product.handle], product.product_images or [], existing))
+                for chunk in self._chunks(media_rows):
+                    session.execute(upsert(ProductMedia), chunk)
+                report.media = len(media_rows)
+
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+        return list(product_ids.values())
+
+    @staticmethod
+    def _media_rows(product_id, images, existing: set, variant_id=None):
+        rows = []
+        for image in images:
+            if (product_id, image.cloudinary_id) in existing:
+                continue
+            existing.add((product_id, image.cloudinary_id))
+            rows.append({
+                'product_id': product_id,
+                'variant_id': variant_id,
+                'alt': image.alt,
+                'src': image.src,
+                'type': image.type,
+                'cloudinary_id': image.cloudinary_id,
+                'width': image.width,
+                'height': image.height,
+                'bytes': image.bytes,
+                'phash': image.phash,
+                'content_hash': image.content_hash,
+            })
+        return rows
+
+    @staticmethod
+    def _chunks(rows: list):
+        for start in range(0, len(rows), STATEMENT_ROWS):
+            yield rows[start:start + STATEMENT_ROWS]
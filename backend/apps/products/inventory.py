@@ -0,0 +1,317 @@
+"""
+Inventory ledger.
+
+Stock changes are appended to `inventory_movements` as signed quantities (receipts,
+sales, cancellations, adjustments) instead of rewriting `product_variants.stock`, so
+checkouts don't all update the same variant row and every change stays auditable.
+`ProductVariant.stock` is a periodic snapshot: `snapshot` folds movements into it and
+marks each of them `folded_at`. Current stock is the snapshot plus the unfolded
+movements (`stock_expression`), read through a partial index on them. Folded movements
+are tracked one by one rather than by an id high-water mark: ids are assigned at insert
+but only become visible at commit, so a movement committed late can sit below movements
+already folded.
+
+`reserve` appends the sales of an order and then checks the resulting stock, so two
+checkouts racing for the last unit can't both succeed; if any line is short, the
+caller's transaction is rolled back and none of the sales are kept. Sales of one
+variant are serialized with a transaction-scoped advisory lock on PostgreSQL (taken in
+variant id order, so overlapping checkouts can't deadlock); SQLite serializes writers
+anyway.
+
+Stock is tracked per variant; lines without a variant are not reserved.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert, update, case, func, literal, exists, and_, Integer, String, DateTime
+from sqlalchemy.orm import Session
+
+from apps.products.models import InventoryMovement, ProductVariant
+from config import settings
+from config.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+RECEIPT, SALE, CANCELLATION, ADJUSTMENT = 'receipt', 'sale', 'cancellation', 'adjustment'
+# first key of the (namespace, variant_id) advisory locks
+ADVISORY_LOCK_NAMESPACE = 7301
+# second key of the snapshot's lock; variant ids start at 1
+SNAPSHOT_LOCK_KEY = 0
+
+
+class InventoryService:
+
+    @staticmethod
+    def _quantities(lines) -> dict[int, int]:
+        """Sum `(variant_id, quantity)` pairs per variant, in variant id order."""
+
+        quantities = Counter()
+        for variant_id, quantity in lines:
+            if variant_id is not None:
+                quantities[variant_id] += quantity
+        return dict(sorted(quantities.items()))
+
+    @staticmethod
+    def _variant_movements(folded_at=None):
+        """Movements of the enclosing query's variant: unfolded, or folded at `folded_at`."""
+
+        return and_(
+            InventoryMovement.variant_id == ProductVariant.id,
+            InventoryMovement.folded_at.is_(None) if folded_at is None else InventoryMovement.folded_at == folded_at,
+        )
+
+    @classmethod
+    def stock_expression(cls):
+        """Current stock of the `ProductVariant` row(s) of the enclosing query."""
+
+        moved = (
+            select(func.coalesce(func.sum(InventoryMovement.quantity), 0))
+            .where(cls._variant_movements())
+            .scalar_subquery()
+        )
+        return func.coalesce(ProductVariant.stock, 0) + moved
+
+    @classmethod
+    def current_stock(cls, session: Session, variant_ids) -> dict[int, int]:
+        if not variant_ids:
+            return {}
+        return dict(session.execute(
+            select(ProductVariant.id, cls.stock_expression()).where(ProductVariant.id.in_(variant_ids))
+        ).all())
+
+    @staticmethod
+    def _lock(session: Session, variant_ids: list[int]):
+        if engine.dialect.name == 'postgresql':
+            # volatile output expressions are evaluated after the sort, so locks are taken in id order
+            session.execute(
+                select(func.pg_advisory_xact_lock(ADVISORY_LOCK_NAMESPACE, ProductVariant.id))
+                .where(ProductVariant.id.in_(variant_ids))
+                .order_by(ProductVariant.id)
+            )
+
+    @staticmethod
+    def record(session: Session, kind: str, quantities: dict[int, int], order_id: int | None = None,
+               note: str | None = None):
+        """
+        Append one `kind` movement per `{variant_id: signed quantity}` within `session`'s
+        transaction. Unknown variants and zero quantities are skipped.
+        """
+
+        quantities = {variant_id: quantity for variant_id, quantity in quantities.items() if quantity}
+        if not quantities:
+            return
+        columns = ['variant_id', 'quantity', 'kind', 'order_id', 'note', 'created_at']
+        session.execute(insert(InventoryMovement).from_select(columns, select(
+            ProductVariant.id,
+            case(quantities, value=ProductVariant.id),
+            literal(kind, String),
+            literal(order_id, Integer),
+            literal(note, String),
+            literal(datetime.utcnow(), DateTime),
+        ).where(ProductVariant.id.in_(quantities)).order_by(ProductVariant.id)))
+
+    @classmethod
+    def reserve(cls, session: Session, lines, order_id: int | None = None) -> list[int]:
+        """
+        Record the sale of `(variant_id, quantity)` lines within `session`'s transaction.
+        Raises 409 listing the short variants if any line can't be covered; the caller
+        must then roll back. Returns the ids of the affected products.
+        """
+
+        quantities = cls._quantities(lines)
+        if not quantities:
+            return []
+
+        cls._lock(session, list(quantities))
+        cls.record(session, SALE, {variant_id: -quantity for variant_id, quantity in quantities.items()}, order_id)
+        rows = session.execute(
+            select(ProductVariant.id, ProductVariant.product_id, cls.stock_expression())
+            .where(ProductVariant.id.in_(quantities))
+        ).all()
+
+        # stock is what's left after this sale; unknown variants have none
+        available = {variant_id: stock + quantities[variant_id] for variant_id, _, stock in rows}
+        short = [
+            {"variant_id": variant_id, "requested": quantity, "available": max(available.get(variant_id, 0), 0)}
+            for variant_id, quantity in quantities.items() if available.get(variant_id, 0) < quantity
+        ]
+        if short:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Insufficient stock", "variants": short},
+            )
+
+        return sorted({product_id for _, product_id, _ in rows})
+
+    @classmethod
+    def release(cls, session: Session, lines, order_id: int | None = None) -> list[int]:
+        """
+        Give the stock of `(variant_id, quantity)` lines back within `session`'s transaction.
+        Returns the ids of the affected products.
+        """
+
+        quantities = cls._quantities(lines)
+        if not quantities:
+            return []
+
+        cls.record(session, CANCELLATION, quantities, order_id)
+        return sorted(set(session.scalars(
+            select(ProductVariant.product_id).where(ProductVariant.id.in_(quantities)))))
+
+    @classmethod
+    def set_stock(cls, session: Session, stock: dict[int, int], kind: str = ADJUSTMENT,
+                  note: str | None = None):
+        """
+        Bring variants to the given `{variant_id: stock}` levels by recording the
+        differences as `kind` movements within `session`'s transaction.
+        """
+
+        if not stock:
+            return
+        cls._lock(session, list(stock))
+        current = cls.current_stock(session, stock)
+        cls.record(session, kind, {
+            variant_id: level - current[variant_id]
+            for variant_id, level in stock.items() if variant_id in current
+        }, note=note)
+
+    @classmethod
+    def add_movement(cls, variant_id: int, kind: str, quantity: int, note: str | None = None) -> dict:
+        """
+        Record a manual receipt or adjustment of a variant; stock can't go below zero.
+        Returns the variant's ledger, see `movements`.
+        """
+
+        with SessionLocal() as session:
+            cls._lock(session, [variant_id])
+            row = session.execute(
+                select(ProductVariant.product_id, cls.stock_expression()).where(ProductVariant.id == variant_id)
+            ).first()
+            if row is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ProductVariant not found.")
+            product_id, stock = row
+            if stock + quantity < 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={"message": "Insufficient stock", "variants": [
+                        {"variant_id": variant_id, "requested": -quantity, "available": stock}]},
+                )
+            cls.record(session, kind, {variant_id: quantity}, note=note)
+            session.commit()
+
+        cls.refresh([product_id])
+        return cls.movements(variant_id)
+
+    @classmethod
+    def movements(cls, variant_id: int, limit: int = 50) -> dict:
+        """Current stock, snapshot and most recent movements of a variant."""
+
+        with SessionLocal() as session:
+            row = session.execute(
+                select(ProductVariant, cls.stock_expression()).where(ProductVariant.id == variant_id)
+            ).first()
+            if row is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ProductVariant not found.")
+            variant, stock = row
+            movements = session.scalars(
+                select(InventoryMovement)
+                .where(InventoryMovement.variant_id == variant_id)
+                .order_by(InventoryMovement.id.desc())
+                .limit(limit)
+            ).all()
+
+            return {
+                'variant_id': variant_id,
+                'stock': stock,
+                'snapshot': {
+                    'stock': variant.stock or 0,
+                    'taken_at': variant.stock_snapshot_at.isoformat() if variant.stock_snapshot_at else None,
+                },
+                'movements': [
+                    {
+                        'id': movement.id,
+                        'kind': movement.kind,
+                        'quantity': movement.quantity,
+                        'order_id': movement.order_id,
+                        'note': movement.note,
+                        'created_at': movement.created_at.isoformat(),
+                        'folded_at': movement.folded_at.isoformat() if movement.folded_at else None,
+                    }
+                    for movement in movements
+                ],
+            }
+
+    @classmethod
+    def snapshot(cls) -> int:
+        """
+        Fold unfolded movements older than `inventory_snapshot_lag_seconds` into the
+        variants' snapshot stock. Returns the number of variants updated.
+
+        The movements are first marked with this run's `folded_at`, then exactly the
+        marked ones are summed into the variants, in one transaction. A movement whose
+        transaction hasn't committed yet isn't marked and is folded by a later run, so
+        none is skipped or counted twice. Runs are serialized with an advisory lock on
+        PostgreSQL; SQLite serializes writers anyway.
+        """
+
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.inventory_snapshot_lag_seconds)
+        folded_at = datetime.utcnow()
+        with SessionLocal() as session:
+            if engine.dialect.name == 'postgresql':
+                session.execute(select(func.pg_advisory_xact_lock(ADVISORY_LOCK_NAMESPACE, SNAPSHOT_LOCK_KEY)))
+            marked = session.execute(
+                update(InventoryMovement)
+                .where(InventoryMovement.folded_at.is_(None), InventoryMovement.created_at <= cutoff)
+                .values(folded_at=folded_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not marked:
+                session.rollback()
+                return 0
+
+            folded = cls._variant_movements(folded_at)
+            moved = select(func.sum(InventoryMovement.quantity)).where(folded).scalar_subquery()
+            result = session.execute(
+                update(ProductVariant)
+                .where(exists().where(folded))
+                .values(
+                    stock=func.coalesce(ProductVariant.stock, 0) + moved,
+                    stock_snapshot_at=folded_at,
+                    # current stock is unchanged, so are the variant's validators
+                    updated_at=ProductVariant.updated_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            return result.rowcount
+
+    @classmethod
+    async def run_periodically(cls):
+        """
+        Take a snapshot every `inventory_snapshot_interval_seconds` for the lifetime of the app.
+        """
+
+        while True:
+            await asyncio.sleep(settings.inventory_snapshot_interval_seconds)
+            try:
+                variants = await run_in_threadpool(cls.snapshot)
+                logger.info("Inventory snapshot updated %s variants", variants)
+            except Exception:
+                logger.exception("Inventory snapshot failed")
+
+    @staticmethod
+    def refresh(product_ids: list[int]):
+        """Rebuild listing rows and drop cached payloads after a committed stock change."""
+
+        # services uses this module for stock, import lazily
+        from apps.products.services import ProductService
+
+        if not product_ids:
+            return
+        ProductService.sync_listing(*product_ids)
+        for product_id in product_ids:
+            ProductService.invalidate_cache(product_id)
@@ -0,0 +1,238 @@
+"""
+Deferred Cloudinary deletion.
+
+Deleting product media only removes the database rows; the Cloudinary public ids are queued in
+`media_deletions` within the same transaction, so no asset is forgotten if the process dies.
+The queue is drained in batches of up to 100 ids per Admin API call, right after the request
+that queued them (as a background task) and periodically from the app's startup loop. Failed
+ids are retried with exponential backoff.
+
+`TempMediaSweeper` feeds the same queue with wizard uploads (`products/temp`) that were never
+attached to a product.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, delete, func
+
+from apps.core.services.cloudinary_service import CloudinaryService
+from apps.products.models import MediaDeletion, ProductMedia
+from config import settings
+from config.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+TEMP_MEDIA_PREFIX = 'products/temp/'
+# orphan ids listed in a sweep report
+REPORT_SAMPLE_SIZE = 100
+
+# statuses returned by Cloudinary that mean the asset is gone, or that it must stay
+DELETED_STATUSES = ('deleted', 'not_found', 'in_use')
+
+
+class MediaDeletionQueue:
+
+    @staticmethod
+    def enqueue(session, cloudinary_ids):
+        """
+        Queue Cloudinary ids for deletion on `session`; they are only queued
+        if the caller's transaction commits.
+        """
+
+        now = datetime.utcnow()
+        session.add_all(
+            MediaDeletion(cloudinary_id=cloudinary_id, next_attempt_at=now)
+            for cloudinary_id in cloudinary_ids if cloudinary_id
+        )
+
+    @classmethod
+    def process(cls, max_batches: int | None = None) -> int:
+        """
+        Delete due queued assets from Cloudinary, one batch per API call, until the
+        queue has nothing due (or `max_batches` ran). Returns the number deleted.
+        """
+
+        deleted, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            processed, batch_deleted = cls._process_batch()
+            if not processed:
+                break
+            deleted += batch_deleted
+            batches += 1
+            if not batch_deleted:
+                # everything in this batch failed; leave the rest for the next run
+                break
+        return deleted
+
+    @classmethod
+    def _process_batch(cls) -> tuple[int, int]:
+        now = datetime.utcnow()
+        query = (
+            select(MediaDeletion)
+            .where(MediaDeletion.next_attempt_at <= now)
+            .order_by(MediaDeletion.next_attempt_at, MediaDeletion.id)
+            .limit(settings.media_deletion_batch_size)
+        )
+        if engine.dialect.name == 'postgresql':
+            # concurrent workers take disjoint batches
+            query = query.with_for_update(skip_locked=True)
+
+        with SessionLocal() as session:
+            entries = session.scalars(query).all()
+            if not entries:
+                return 0, 0
+
+            # assets shared through duplicate reuse stay while any media row still uses them
+            in_use = set(session.scalars(select(ProductMedia.cloudinary_id).where(
+                ProductMedia.cloudinary_id.in_({entry.cloudinary_id for entry in entries}))))
+            statuses = {cloudinary_id: 'in_use' for cloudinary_id in in_use}
+            to_delete = list(dict.fromkeys(entry.cloudinary_id for entry in entries if entry.cloudinary_id not in in_use))
+
+            error = None
+            if to_delete:
+                try:
+                    statuses.update(CloudinaryService.delete_images(to_delete))
+                except Exception as exc:
+                    error = str(exc)
+
+            done = [entry.id for entry in entries if statuses.get(entry.cloudinary_id) in DELETED_STATUSES]
+            for entry in entries:
+                if entry.id in done:
+                    continue
+                entry.attempts += 1
+                entry.last_error = error or f"cloudinary status: {statuses.get(entry.cloudinary_id)}"
+                entry.next_attempt_at = now + cls.backoff(entry.attempts)
+            if done:
+                session.execute(delete(MediaDeletion).where(MediaDeletion.id.in_(done)))
+            session.commit()
+
+        if error:
+            logger.warning("Cloudinary batch delete failed for %s assets: %s", len(entries), error)
+        return len(entries), len(done)
+
+    @staticmethod
+    def pending() -> int:
+        with SessionLocal() as session:
+            return session.scalar(select(func.count()).select_from(MediaDeletion))
+
+    @staticmethod
+    def backoff(attempts: int) -> timedelta:
+        seconds = settings.media_deletion_retry_seconds * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, settings.media_deletion_max_retry_seconds))
+
+    @classmethod
+    async def run_periodically(cls):
+        """
+        Drain the queue every `media_deletion_poll_seconds` for the lifetime of the app.
+        """
+
+        while True:
+            try:
+                await run_in_threadpool(cls.process)
+            except Exception:
+                logger.exception("Media deletion queue run failed")
+            await asyncio.sleep(settings.media_deletion_poll_seconds)
+
+
+class TempMediaSweeper:
+    """
+    Queues deletion of `products/temp` uploads older than `temp_media_max_age_hours`
+    that no `ProductMedia` row references.
+    """
+
+    runs = 0
+    orphans_queued = 0
+    bytes_queued = 0
+    last_report: dict | None = None
+
+    @classmethod
+    def sweep(cls, dry_run: bool = False, max_age_hours: int | None = None) -> dict:
+        """
+        Scan the whole temp folder page by page (listings aren't ordered by age, so
+        every page is filtered on `created_at`), checking each page's expired uploads
+        against `ProductMedia.cloudinary_id` with one indexed IN lookup. With `dry_run`
+        nothing is queued; the report tells what would be.
+        """
+
+        max_age_hours = settings.temp_media_max_age_hours if max_age_hours is None else max_age_hours
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+        report = {
+            'dry_run': dry_run,
+            'max_age_hours': max_age_hours,
+            'scanned': 0,
+            'expired': 0,
+            'linked': 0,
+            'orphaned': 0,
+            'orphaned_bytes': 0,
+            'queued': 0,
+            'queued_bytes': 0,
+            'orphans': [],
+            'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        }
+
+        for page in CloudinaryService.list_images(TEMP_MEDIA_PREFIX):
+            report['scanned'] += len(page)
+            expired = [
+                resource for resource in page
+                if datetime.fromisoformat(resource['created_at'].replace('Z', '+00:00')) < cutoff
+            ]
+            report['expired'] += len(expired)
+            if not expired:
+                continue
+
+            public_ids = [resource['public_id'] for resource in expired]
+            with SessionLocal() as session:
+                linked = set(session.scalars(
+                    select(ProductMedia.cloudinary_id).where(ProductMedia.cloudinary_id.in_(public_ids))))
+                queued = set(session.scalars(
+                    select(MediaDeletion.cloudinary_id).where(MediaDeletion.cloudinary_id.in_(public_ids))))
+                orphans = [resource for resource in expired if resource['public_id'] not in linked]
+
+                report['linked'] += len(linked)
+                report['orphaned'] += len(orphans)
+                report['orphaned_bytes'] += sum(resource['bytes'] or 0 for resource in orphans)
+                report['orphans'].extend(
+                    resource['public_id'] for resource in orphans[:REPORT_SAMPLE_SIZE - len(report['orphans'])])
+
+                if not dry_run:
+                    new = [resource for resource in orphans if resource['public_id'] not in queued]
+                    MediaDeletionQueue.enqueue(session, [resource['public_id'] for resource in new])
+                    session.commit()
+                    report['queued'] += len(new)
+                    report['queued_bytes'] += sum(resource['bytes'] or 0 for resource in new)
+
+        if not dry_run:
+            cls.runs += 1
+            cls.orphans_queued += report['queued']
+            cls.bytes_queued += report['queued_bytes']
+            cls.last_report = report
+            if report['queued']:
+                MediaDeletionQueue.process()
+        return report
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            'runs': cls.runs,
+            'orphans_queued': cls.orphans_queued,
+            'bytes_queued': cls.bytes_queued,
+            'pending_deletions': MediaDeletionQueue.pending(),
+            'last_report': cls.last_report,
+        }
+
+    @classmethod
+    async def run_periodically(cls):
+        """
+        Sweep every `temp_media_sweep_interval_hours` for the lifetime of the app.
+        The first sweep waits one interval too, so restarts don't spend Admin API quota.
+        """
+
+        while True:
+            await asyncio.sleep(settings.temp_media_sweep_interval_hours * 3600)
+            try:
+                report = await run_in_threadpool(cls.sweep)
+                logger.info("Temp media sweep queued %s of %s scanned assets", report['queued'], report['scanned'])
+            except Exception:
+                logger.exception("Temp media sweep failed")
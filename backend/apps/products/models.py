@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, Text, DateTime, func, Numeric
+from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, Text, DateTime, func, Numeric, Index, Boolean, text
 from sqlalchemy.orm import relationship
 
 from config.database import FastModel
@@ -8,6 +8,8 @@ class Product(FastModel):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True)
+    # stable external key used by catalog imports
+    handle = Column(String(255), nullable=True, unique=True, index=True)
     product_name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     ingredients = Column(Text, nullable=True)
@@ -29,6 +31,8 @@ class Product(FastModel):
     variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
     media = relationship("ProductMedia", back_populates="product", cascade="all, delete-orphan")
 
+    # listing, filtering and sorting read `product_listing`, whose indexes back them
+
     # TODO add user_id to track which user added this product
 
 
@@ -62,8 +66,12 @@ class ProductVariant(FastModel):
 
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"))
+    sku = Column(String(100), nullable=True, unique=True, index=True)
     price = Column(Numeric(12, 2), default=0)
+    # stock as of the last inventory snapshot, which folded in the movements marked
+    # `folded_at`; current stock adds the unfolded ones (see InventoryService)
     stock = Column(Integer, default=0)
+    stock_snapshot_at = Column(DateTime, nullable=True)
 
     option1 = Column(Integer, ForeignKey("product_option_items.id"), nullable=True)
     option2 = Column(Integer, ForeignKey("product_option_items.id"), nullable=True)
@@ -72,6 +80,12 @@ class ProductVariant(FastModel):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
 
+    __table_args__ = (
+        Index('ix_product_variants_product_id_price', 'product_id', 'price'),
+        # resolving a variant from its option combination
+        Index('ix_product_variants_product_id_options', 'product_id', 'option1', 'option2', 'option3'),
+    )
+
     # option1 = relationship("ProductOptionItem", foreign_keys=[option1_id])
     # option2 = relationship("ProductOptionItem", foreign_keys=[option2_id])
     # option3 = relationship("ProductOptionItem", foreign_keys=[option3_id])
@@ -99,7 +113,93 @@ class ProductMedia(FastModel):
     #  Cloudinary public_id (IMPORTANT)
     cloudinary_id = Column(String, nullable=False, index=True)
 
+    # original dimensions and size, from the upload result
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    bytes = Column(Integer, nullable=True)
+    # 64-bit dHash (hex) of the image, see ImageProcessor.dhash
+    phash = Column(String(16), nullable=True, index=True)
+    # SHA-256 (hex) of the uploaded bytes, confirms exact duplicates
+    content_hash = Column(String(64), nullable=True, index=True)
+
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
 
     product = relationship("Product", back_populates="media")
+
+
+class InventoryMovement(FastModel):
+    """
+    Append-only stock ledger: one signed quantity per receipt, sale,
+    cancellation or adjustment of a variant.
+    """
+
+    __tablename__ = "inventory_movements"
+
+    id = Column(Integer, primary_key=True)
+    variant_id = Column(Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    kind = Column(String(20), nullable=False)  # receipt, sale, cancellation, adjustment
+    order_id = Column(Integer, nullable=True)
+    note = Column(String(255), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    # set by the snapshot that folded this movement into the variant's stock
+    folded_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_inventory_movements_variant_id_id', 'variant_id', 'id'),
+        # current stock sums a variant's unfolded movements
+        Index('ix_inventory_movements_unfolded', 'variant_id',
+              postgresql_where=text('folded_at IS NULL'), sqlite_where=text('folded_at IS NULL')),
+    )
+
+
+class MediaDeletion(FastModel):
+    """
+    Cloudinary asset whose `ProductMedia` row is gone and that still has to be
+    removed from Cloudinary; drained by `MediaDeletionQueue`.
+    """
+
+    __tablename__ = "media_deletions"
+
+    id = Column(Integer, primary_key=True)
+    cloudinary_id = Column(String, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class ProductListing(FastModel):
+    """
+    Denormalized listing card of a product: one row per product with its lowest price,
+    total stock and primary image precomputed, so listing, sorting and filtering read a
+    single indexed table. Rebuilt by `ProductService.sync_listing` after every catalog write.
+    """
+
+    __tablename__ = "product_listing"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    product_name = Column(String(255), nullable=False)
+    category = Column(String(255), nullable=True)
+    product_type = Column(String(50), nullable=True)
+    status = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+
+    min_price = Column(Numeric(12, 2), nullable=True)
+    max_price = Column(Numeric(12, 2), nullable=True)
+    total_stock = Column(Integer, nullable=False, default=0)
+    in_stock = Column(Boolean, nullable=False, default=False)
+    primary_image = Column(String, nullable=True)
+
+    synced_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_product_listing_status_created_at', 'status', 'created_at', 'product_id'),
+        Index('ix_product_listing_status_product_name', 'status', 'product_name', 'product_id'),
+        Index('ix_product_listing_status_min_price', 'status', 'min_price', 'product_id'),
+        Index('ix_product_listing_status_category_created_at', 'status', 'category', 'created_at', 'product_id'),
+        Index('ix_product_listing_status_product_type_created_at',
+              'status', 'product_type', 'created_at', 'product_id'),
+        Index('ix_product_listing_status_in_stock_created_at', 'status', 'in_stock', 'created_at', 'product_id'),
+    )
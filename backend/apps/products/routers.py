@@ -16,18 +16,63 @@ from fastapi import (
     Query,
     Path,
     Depends,
-    Request
+    Request,
+    BackgroundTasks,
 )
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from apps.core.compression import Compression
+from apps.core.conditional import ConditionalGet
+from apps.core.responses import FastJSONResponse
 
 from apps.accounts.dependencies import require_superuser
 from apps.accounts.services.permissions import Permission
 
 from apps.products import schemas
-from apps.products.services import ProductService
+from apps.products.exporter import CatalogExporter
+from apps.products.inventory import InventoryService
+from apps.products.media_cleanup import MediaDeletionQueue, TempMediaSweeper
+from apps.products.search import ProductSearchService
+from apps.products.services import ProductService, product_cache
+from config import settings
 
 router = APIRouter(prefix="/products")
 
+
+def _evaluate_preconditions(request: Request, response: Response, product_id: int, representation: str):
+    """
+    Answer conditional GETs on a product's endpoints from its graph version,
+    so unchanged products get a 304 without their payload being built.
+    Bodies may go out compressed, and a strong ETag has to differ per
+    content-coding, so the negotiated encoding is part of it.
+    """
+
+    validators = ProductService.product_validators(product_id)
+    encoding = Compression.negotiate(request.headers.get('accept-encoding'))
+    etag = ConditionalGet.etag(representation, validators["version"], encoding or "identity")
+    not_modified = ConditionalGet.evaluate(request, response, etag, validators["last_modified"])
+    (not_modified or response).headers['Vary'] = 'Accept-Encoding'
+    return not_modified
+
+
+FIELDS_QUERY = Query(None, description="Comma separated product keys to return, e.g. `product_name,min_price`")
+INCLUDE_QUERY = Query(None, description="Comma separated collections to embed: `options`, `variants`, `media`")
+
+
+def _fast_response(response: Response, content: dict | bytes, encoding: str | None = None):
+    """
+    Product payloads are built (or cached) by the service in the documented shape,
+    so they skip response-model validation; partial ones wouldn't pass it anyway.
+    Headers already set on `response` are kept. `encoding` marks precompressed content.
+    """
+    headers = dict(response.headers)
+    if encoding is not None:
+        # response.headers keys are lower case
+        headers.update({'content-encoding': encoding, 'vary': 'Accept-Encoding'})
+    return FastJSONResponse(content, headers=headers)
+
+
 # ==========================================================
 # ===================== PRODUCT ROUTES =====================
 # ==========================================================
@@ -72,6 +117,118 @@ async def create_product_comprehensive(request: Request, product: schemas.Create
 
 
 
+@router.get(
+    "/search",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.SearchProductsOut,
+    summary="Full-text search over active products",
+    tags=["Product"],
+)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit),
+):
+    found = ProductSearchService.search(q, limit=limit, offset=(page - 1) * limit)
+    return {**found, "page": page}
+
+
+@router.get(
+    "/facets",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ProductFacetsOut,
+    summary="Product counts per category, type, price band and stock state",
+    tags=["Product"],
+)
+async def product_facets(
+    product_status: str = Query("active", alias="status", pattern="^(active|archived|draft)$"),
+    category: str | None = Query(None),
+    product_type: str | None = Query(None),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    in_stock: bool | None = Query(None),
+):
+    return ProductService.product_facets(
+        status=product_status,
+        category=category,
+        product_type=product_type,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Stream the full catalog as NDJSON or CSV",
+    tags=["Product"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def export_products(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    product_status: str | None = Query(None, alias="status", pattern="^(active|archived|draft)$"),
+):
+    exporter = CatalogExporter(status=product_status)
+    if export_format == "csv":
+        body, media_type = exporter.csv(), "text/csv"
+    else:
+        body, media_type = exporter.ndjson(), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="catalog.{export_format}"'},
+    )
+
+
+@router.get(
+    "/cache/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Product cache hit/miss counters",
+    tags=["Product"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def product_cache_stats():
+    return product_cache.stats()
+
+
+@router.get(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.BatchProductsOut,
+    summary="Retrieve many products by id",
+    tags=["Product"],
+)
+async def retrieve_products_batch(
+    response: Response,
+    ids: str = Query(..., description="Comma separated product ids"),
+    fields: str | None = FIELDS_QUERY,
+    include: str | None = INCLUDE_QUERY,
+):
+    """
+    Products in the order of `ids`, for pages listing many of them (cart, orders, wishlist).
+    Ids that don't exist are reported in `missing`.
+    """
+    try:
+        product_ids = [int(product_id) for product_id in ids.split(',') if product_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma separated integers.")
+    if len(set(product_ids)) > settings.products_batch_max_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.products_batch_max_ids} ids per request.")
+
+    field_set, include_set = ProductService.parse_representation(fields, include)
+    if field_set is None and include_set is None:
+        return _fast_response(response, ProductService.retrieve_products_batch_encoded(product_ids))
+    return _fast_response(response, ProductService.retrieve_products_batch(product_ids, field_set, include_set))
+
+
 @router.get(
     "/{product_id}",
     status_code=status.HTTP_200_OK,
@@ -79,10 +236,26 @@ async def create_product_comprehensive(request: Request, product: schemas.Create
     summary="Retrieve a single product",
     tags=["Product"],
 )
-async def retrieve_product(request: Request, product_id: int):
-    return {
-        "product": ProductService(request).retrieve_product(product_id)
-    }
+async def retrieve_product(
+    request: Request,
+    response: Response,
+    product_id: int,
+    fields: str | None = FIELDS_QUERY,
+    include: str | None = INCLUDE_QUERY,
+):
+    field_set, include_set = ProductService.parse_representation(fields, include)
+    representation = "product"
+    if field_set is not None or include_set is not None:
+        representation = f"product;fields={sorted(field_set or [])};include={sorted(include_set or [])}"
+
+    not_modified = _evaluate_preconditions(request, response, product_id, representation)
+    if not_modified:
+        return not_modified
+    if field_set is None and include_set is None:
+        encoding = Compression.negotiate(request.headers.get('accept-encoding'))
+        return _fast_response(response, *ProductService.retrieve_product_body(product_id, encoding))
+    product = ProductService(request).retrieve_product(product_id, field_set, include_set)
+    return _fast_response(response, {"product": product})
 
 
 @router.get(
@@ -92,11 +265,37 @@ async def retrieve_product(request: Request, product_id: int):
     summary="Retrieve a list of products",
     tags=["Product"],
 )
-async def list_products(request: Request):
-    products = ProductService(request).list_products()
-    if not products:
-        return {"products": []}
-    return {"products": products}
+async def list_products(
+    request: Request,
+    response: Response,
+    cursor: str | None = Query(None, description="`next_cursor` of the previous page"),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit),
+    product_status: str = Query("active", alias="status", pattern="^(active|archived|draft)$"),
+    category: str | None = Query(None),
+    product_type: str | None = Query(None),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    in_stock: bool | None = Query(None),
+    sort: str = Query("newest", pattern="^(newest|price_asc|price_desc|name)$"),
+    fields: str | None = FIELDS_QUERY,
+    include: str | None = INCLUDE_QUERY,
+):
+    field_set, include_set = ProductService.parse_representation(fields, include)
+    filters = dict(
+        limit=limit,
+        cursor=cursor,
+        status=product_status,
+        category=category,
+        product_type=product_type,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        sort=sort,
+    )
+    if field_set is None and include_set is None:
+        encoding = Compression.negotiate(request.headers.get('accept-encoding'))
+        return _fast_response(response, *ProductService.list_products_body(encoding, **filters))
+    return _fast_response(response, ProductService(request).list_products(field_set, include_set, **filters))
 
 
 @router.put(
@@ -131,8 +330,9 @@ async def update_product(
         Depends(Permission.is_admin),
     ],
 )
-async def delete_product(product_id: int):
+async def delete_product(background_tasks: BackgroundTasks, product_id: int):
     ProductService.delete_product(product_id)
+    background_tasks.add_task(MediaDeletionQueue.process)
 
 
 # ==========================================================
@@ -160,12 +360,56 @@ async def retrieve_variant(variant_id: int):
     summary="List product variants",
     tags=["Product Variant"],
 )
-async def list_variants(product_id: int):
+async def list_variants(request: Request, response: Response, product_id: int):
+    not_modified = _evaluate_preconditions(request, response, product_id, "variants")
+    if not_modified:
+        return not_modified
     return {
         "variants": ProductService.retrieve_variants(product_id)
     }
 
 
+@router.get(
+    "/{product_id}/variants/resolve",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.RetrieveVariantOut,
+    summary="Find a product variant by its options",
+    tags=["Product Variant"],
+)
+async def resolve_variant(
+    product_id: int,
+    option1: str | None = Query(None, description="Item of the first option, e.g. `50ml`"),
+    option2: str | None = Query(None, description="Item of the second option"),
+    option3: str | None = Query(None, description="Item of the third option"),
+    by: str = Query("name", pattern="^(name|id)$", description="Whether the items are given by `name` or `id`"),
+):
+    """
+    Resolve a selection like "50ml / Eau de Parfum" to its variant. Options left out match
+    variants that don't have them; 404 if no variant has this combination, 409 if several do.
+    """
+    return {
+        "variant": ProductService.resolve_variant(product_id, [option1, option2, option3], by)
+    }
+
+
+@router.post(
+    "/variants/preview",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.PreviewVariantsOut,
+    summary="Preview the variant matrix of a set of options",
+    tags=["Product Variant"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def preview_variants(payload: schemas.PreviewVariantsIn):
+    """
+    Report how many variants `POST /products` would generate for these options, without writing anything.
+    """
+    return ProductService.preview_variants(payload.model_dump()["options"])
+
+
 @router.put(
     "/variants/{variant_id}",
     status_code=status.HTTP_200_OK,
@@ -184,6 +428,42 @@ async def update_variant(variant_id: int, payload: schemas.UpdateVariantIn):
     }
 
 
+@router.get(
+    "/variants/{variant_id}/inventory",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.VariantInventoryOut,
+    summary="Retrieve the inventory ledger of a variant",
+    tags=["Product Variant"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def retrieve_variant_inventory(variant_id: int, limit: int = Query(50, ge=1, le=500)):
+    """
+    Current stock, the last snapshot and the most recent movements, newest first.
+    """
+    return InventoryService.movements(variant_id, limit)
+
+
+@router.post(
+    "/variants/{variant_id}/inventory",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.VariantInventoryOut,
+    summary="Record a stock receipt or adjustment",
+    tags=["Product Variant"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def add_variant_inventory_movement(variant_id: int, payload: schemas.InventoryMovementIn):
+    """
+    Append a signed quantity to the variant's ledger; 409 if stock would go below zero.
+    """
+    return InventoryService.add_movement(variant_id, payload.kind, payload.quantity, payload.note)
+
+
 # ==========================================================
 # =================== PRODUCT MEDIA ROUTES ==================
 # ==========================================================
@@ -207,23 +487,33 @@ async def upload_temp_media(
     """
     Upload images to Cloudinary without associating them to a product yet.
     Returns Cloudinary URLs that can be used during product creation.
+    Duplicates are always uploaded: without a product there is nothing to scope reuse to.
     """
     from apps.core.services.cloudinary_service import CloudinaryService
-    
-    uploaded_images = []
-    for file in files:
-        upload = CloudinaryService.upload_image(
-            file=file,
-            folder="products/temp"
-        )
+
+    results = await run_in_threadpool(CloudinaryService.upload_images, files, "products/temp")
+
+    uploaded_images, errors = [], []
+    for result in results:
+        if "error" in result:
+            errors.append(result)
+            continue
+        upload = result["upload"]
         uploaded_images.append({
             "src": upload["secure_url"],
             "cloudinary_id": upload["public_id"],
             "alt": alt or "Product image",
             "type": upload["format"],
+            "width": upload["width"],
+            "height": upload["height"],
+            "bytes": upload["bytes"],
+            "phash": upload["phash"],
+            "content_hash": upload["content_hash"],
         })
-    
-    return {"images": uploaded_images}
+    if not uploaded_images:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=errors)
+
+    return {"images": uploaded_images, "errors": errors}
 
 
 @router.post(
@@ -243,12 +533,53 @@ async def create_product_media(
     files: list[UploadFile] = File(...),
     alt: str | None = Form(None),
 ):
-    media = ProductService(request).create_media(
+    # uploads block on network I/O; keep them off the event loop
+    return await run_in_threadpool(
+        ProductService(request).create_media,
         product_id=product_id,
         alt=alt,
         files=files,
     )
-    return {"media": media}
+
+
+@router.post(
+    "/{product_id}/media/upload-signature",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.SignedUploadOut,
+    summary="Get signed parameters for a direct browser upload to Cloudinary",
+    tags=["Product Image"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def sign_product_media_upload(product_id: int):
+    """
+    POST the file to `upload_url` as multipart form data with `file`, `folder`, `timestamp`,
+    `signature` and `api_key`, then pass Cloudinary's response to `/{product_id}/media/confirm`.
+    """
+    return ProductService.sign_media_upload(product_id)
+
+
+@router.post(
+    "/{product_id}/media/confirm",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.CreateProductMediaOut,
+    summary="Attach images uploaded directly to Cloudinary",
+    tags=["Product Image"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def confirm_product_media(product_id: int, payload: schemas.ConfirmMediaIn):
+    # one Admin API lookup per upload; keep it off the event loop
+    return await run_in_threadpool(
+        ProductService.confirm_media,
+        product_id,
+        uploads=[upload.model_dump() for upload in payload.uploads],
+        alt=payload.alt,
+    )
 
 
 @router.get(
@@ -258,12 +589,63 @@ async def create_product_media(
     summary="Receive a list of all Product Images",
     tags=['Product Image']
 )
-async def list_product_media(request: Request, product_id: int):
+async def list_product_media(request: Request, response: Response, product_id: int):
+    not_modified = _evaluate_preconditions(request, response, product_id, "media")
+    if not_modified:
+        return not_modified
     media = ProductService(request).retrieve_media_list(product_id)
     return {"media": media or []}
 
 
 
+@router.get(
+    "/media/duplicates",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.MediaDuplicatesOut,
+    summary="List clusters of near-identical product images",
+    tags=["Product Image"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def list_duplicate_media(max_distance: int | None = Query(None, ge=0, le=15)):
+    return {"clusters": await run_in_threadpool(ProductService.duplicate_media_clusters, max_distance)}
+
+
+@router.post(
+    "/media/temp-sweep",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.TempMediaSweepOut,
+    summary="Delete wizard uploads never attached to a product (dry run by default)",
+    tags=["Product Image"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def sweep_temp_media(
+    dry_run: bool = Query(True),
+    max_age_hours: int | None = Query(None, ge=1),
+):
+    return await run_in_threadpool(TempMediaSweeper.sweep, dry_run=dry_run, max_age_hours=max_age_hours)
+
+
+@router.get(
+    "/media/temp-sweep/stats",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.TempMediaSweepStatsOut,
+    summary="Temp media sweeper metrics",
+    tags=["Product Image"],
+    dependencies=[
+        Depends(require_superuser),
+        Depends(Permission.is_admin),
+    ],
+)
+async def temp_media_sweep_stats():
+    return TempMediaSweeper.stats()
+
+
 @router.get(
     "/media/{media_id}",
     status_code=status.HTTP_200_OK,
@@ -300,9 +682,9 @@ async def update_media(
     if alt:
         data["alt"] = alt
 
-    return {
-        "media": ProductService(request).update_media(media_id, **data)
-    }
+    # preprocessing and upload are CPU / network bound; keep them off the event loop
+    media = await run_in_threadpool(ProductService(request).update_media, media_id, **data)
+    return {"media": media}
 
 
 @router.delete(
@@ -316,11 +698,13 @@ async def update_media(
     ],
 )
 async def delete_product_media(
+    background_tasks: BackgroundTasks,
     product_id: int,
     media_ids: str = Query(..., description="Comma separated media IDs"),
 ):
     ids = list(map(int, media_ids.split(",")))
     ProductService.delete_product_media(product_id, ids)
+    background_tasks.add_task(MediaDeletionQueue.process)
 
 
 @router.delete(
@@ -333,5 +717,6 @@ async def delete_product_media(
         Depends(Permission.is_admin),
     ],
 )
-async def delete_media_file(media_id: int):
+async def delete_media_file(background_tasks: BackgroundTasks, media_id: int):
     ProductService.delete_media_file(media_id)
+    background_tasks.add_task(MediaDeletionQueue.process)
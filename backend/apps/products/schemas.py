@@ -18,6 +18,10 @@ class VariantSchema(BaseModel):
     option1: int | None
     option2: int | None
     option3: int | None
+    option1_name: str | None = None
+    option2_name: str | None = None
+    option3_name: str | None = None
+    title: str | None = None  # e.g. "50ml / Eau de Parfum"
     created_at: str
     updated_at: str | None
 
@@ -39,6 +43,47 @@ class ListVariantsOut(BaseModel):
     variants: list[VariantSchema]
 
 
+class InventoryMovementIn(BaseModel):
+    kind: str = 'receipt'
+    quantity: int
+    note: str | None = None
+
+    @field_validator('kind')
+    def validate_kind(cls, kind):
+        # sales and cancellations are recorded by orders
+        if kind not in ('receipt', 'adjustment'):
+            raise ValueError('Kind must be receipt or adjustment.')
+        return kind
+
+    @field_validator('quantity')
+    def validate_quantity(cls, quantity):
+        if quantity == 0:
+            raise ValueError('Quantity must not be zero.')
+        return quantity
+
+
+class InventoryMovementOut(BaseModel):
+    id: int
+    kind: str
+    quantity: int
+    order_id: int | None
+    note: str | None
+    created_at: str
+    folded_at: str | None = None
+
+
+class InventorySnapshotOut(BaseModel):
+    stock: int
+    taken_at: str | None
+
+
+class VariantInventoryOut(BaseModel):
+    variant_id: int
+    stock: int
+    snapshot: InventorySnapshotOut
+    movements: list[InventoryMovementOut]
+
+
 """
 ---------------------------------------
 --------------- Options ---------------
@@ -68,6 +113,17 @@ class OptionIn(BaseModel):
         return value
 
 
+class PreviewVariantsIn(BaseModel):
+    options: list[OptionIn]
+
+
+class PreviewVariantsOut(BaseModel):
+    combinations: int
+    max_variants: int
+    allowed: bool
+    sample: list[list[str]]
+
+
 """
 ---------------------------------------
 ---------------- Media ----------------
@@ -75,18 +131,40 @@ class OptionIn(BaseModel):
 """
 
 
+class ImageSourceOut(BaseModel):
+    width: int
+    url: str
+
+
 class ProductMediaSchema(BaseModel):
     media_id: int
     product_id: int
     alt: str
     src: str
     type: str
+    width: int | None = None
+    height: int | None = None
+    bytes: int | None = None
+    srcset: list[ImageSourceOut] = []
     updated_at: str | None
     created_at: str
 
 
+class MediaUploadErrorOut(BaseModel):
+    filename: str | None
+    error: str
+
+
+class MediaReuseOut(BaseModel):
+    filename: str | None
+    cloudinary_id: str
+
+
 class CreateProductMediaOut(BaseModel):
     media: list[ProductMediaSchema]
+    errors: list[MediaUploadErrorOut] = []
+    # files matching one of the product's images, attached without a new upload
+    reused: list[MediaReuseOut] = []
 
 
 class CreateProductMediaIn(BaseModel):
@@ -106,6 +184,67 @@ class MultiFileUpload(BaseModel):
         from_attributes = True
 
 
+class SignedUploadOut(BaseModel):
+    upload_url: str
+    cloud_name: str | None
+    api_key: str | None
+    folder: str
+    timestamp: int
+    signature: str
+
+
+class ConfirmedUploadIn(BaseModel):
+    """
+    Fields of Cloudinary's upload response, passed back unchanged by the client.
+    Only the signed ones are used; format, dimensions and size are read from Cloudinary.
+    """
+    public_id: str
+    version: int
+    signature: str
+    format: str | None = None
+    width: int | None = None
+    height: int | None = None
+    bytes: int | None = None
+    variant_id: int | None = None
+
+
+class ConfirmMediaIn(BaseModel):
+    uploads: list[ConfirmedUploadIn]
+    alt: str | None = None
+
+
+class MediaDuplicateClusterOut(BaseModel):
+    phash: str
+    assets: int
+    media: list[ProductMediaSchema]
+
+
+class MediaDuplicatesOut(BaseModel):
+    clusters: list[MediaDuplicateClusterOut]
+
+
+class TempMediaSweepOut(BaseModel):
+    dry_run: bool
+    max_age_hours: int
+    scanned: int
+    expired: int
+    linked: int
+    orphaned: int
+    orphaned_bytes: int
+    queued: int
+    queued_bytes: int
+    orphans: list[str]
+    started_at: str
+
+
+class TempMediaSweepStatsOut(BaseModel):
+    runs: int
+    orphans_queued: int
+    bytes_queued: int
+    pending_deletions: int
+    last_report: TempMediaSweepOut | None
+
+
 class RetrieveProductMediaOut(BaseModel):
     media: list[ProductMediaSchema] | None = None
 
@@ -210,12 +349,42 @@ class RetrieveProductOut(BaseModel):
     product: ProductSchema
 
 
+class BatchProductsOut(BaseModel):
+    products: list[ProductSchema]
+    missing: list[int]
+
+
 class ListProductIn(BaseModel):
     ...
 
 
 class ListProductOut(BaseModel):
     products: list[ProductSchema]
+    next_cursor: str | None = None
+
+
+class SearchResultOut(BaseModel):
+    product: ProductSchema
+    rank: float
+    highlights: dict[str, str | None]
+
+
+class SearchProductsOut(BaseModel):
+    results: list[SearchResultOut]
+    page: int
+    has_more: bool
+
+
+class FacetCountOut(BaseModel):
+    value: str | None
+    count: int
+
+
+class ProductFacetsOut(BaseModel):
+    category: list[FacetCountOut]
+    product_type: list[FacetCountOut]
+    price_band: list[FacetCountOut]
+    stock: list[FacetCountOut]
 
 
 class UpdateProductIn(BaseModel):
@@ -245,6 +414,11 @@ class VariantMediaIn(BaseModel):
     cloudinary_id: str
     alt: str | None = None
     type: str = "image"
+    width: int | None = None
+    height: int | None = None
+    bytes: int | None = None
+    phash: str | None = None
+    content_hash: str | None = None
 
 
 class VariantIn(BaseModel):
@@ -310,3 +484,21 @@ class CreateProductWithVariantsIn(BaseModel):
                 raise ValueError('Duplicate option names found.')
         
         return values
+
+
+"""
+---------------------------------------
+----------- Catalog Import ------------
+---------------------------------------
+"""
+
+
+class ImportVariantIn(VariantIn):
+    """A variant row of a catalog feed; `sku` is the upsert key"""
+    sku: constr(min_length=1, max_length=100)
+
+
+class ImportProductIn(CreateProductWithVariantsIn):
+    """A product document of a catalog feed; `handle` is the upsert key"""
+    handle: constr(min_length=1, max_length=255)
+    variants: list[ImportVariantIn] | None = None
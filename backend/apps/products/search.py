@@ -0,0 +1,138 @@
+"""
+Full-text product search.
+
+On PostgreSQL, matching runs against `products.search_vector`, a generated, weighted tsvector
+column with a GIN index (see the `add_product_search` migration). Trigram similarity on
+`product_name` (pg_trgm) tolerates typos. On SQLite, used for local runs, an FTS5 table that is
+kept in sync by triggers is created on first use. Prefix matching stands in for typo tolerance
+there.
+"""
+import re
+import threading
+
+from sqlalchemy import text
+
+from apps.products.services import ProductService
+from config.database import SessionLocal, engine
+
+HIGHLIGHT_FIELDS = ('product_name', 'description', 'ingredients', 'category')
+
+_POSTGRES_SEARCH = text("""
+    WITH query AS (SELECT websearch_to_tsquery('english', :q) AS tsq),
+    page AS (
+        SELECT p.id,
+               ts_rank_cd(p.search_vector, query.tsq) + word_similarity(:q, p.product_name) AS rank
+        FROM products p, query
+        WHERE p.status = :status
+          AND (p.search_vector @@ query.tsq OR :q <% p.product_name)
+        ORDER BY rank DESC, p.id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id,
+           page.rank,
+           ts_headline('english', coalesce(p.product_name, ''), query.tsq, :opts) AS product_name,
+           ts_headline('english', coalesce(p.description, ''), query.tsq, :opts) AS description,
+           ts_headline('english', coalesce(p.ingredients, ''), query.tsq, :opts) AS ingredients,
+           ts_headline('english', coalesce(p.category, ''), query.tsq, :opts) AS category
+    FROM page JOIN products p ON p.id = page.id, query
+    ORDER BY page.rank DESC, page.id
+""")
+
+_SQLITE_SEARCH = text("""
+    SELECT p.id,
+           -bm25(products_fts, 10.0, 2.0, 2.0, 5.0) AS rank,
+           highlight(products_fts, 0, '<mark>', '</mark>') AS product_name,
+           snippet(products_fts, 1, '<mark>', '</mark>', '…', 16) AS description,
+           snippet(products_fts, 2, '<mark>', '</mark>', '…', 16) AS ingredients,
+           highlight(products_fts, 3, '<mark>', '</mark>') AS category
+    FROM products_fts JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH :q AND p.status = :status
+    ORDER BY rank DESC, p.id
+    LIMIT :limit OFFSET :offset
+""")
+
+_SQLITE_SETUP = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_name, description, ingredients, category,
+        content='products', content_rowid='id', tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, product_name, description, ingredients, category)
+        VALUES (new.id, new.product_name, new.description, new.ingredients, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, description, ingredients, category)
+        VALUES ('delete', old.id, old.product_name, old.description, old.ingredients, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, description, ingredients, category)
+        VALUES ('delete', old.id, old.product_name, old.description, old.ingredients, old.category);
+        INSERT INTO products_fts(rowid, product_name, description, ingredients, category)
+        VALUES (new.id, new.product_name, new.description, new.ingredients, new.category);
+    END""",
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+)
+
+
+class ProductSearchService:
+    _sqlite_ready = False
+    _sqlite_lock = threading.Lock()
+
+    @classmethod
+    def search(cls, q: str, limit: int, offset: int = 0, status: str = 'active'):
+        """
+        Return ranked matches for `q` as `{'results': [...], 'has_more': bool}`.
+        Each result carries the product payload, its rank and `<mark>`-highlighted fields.
+        """
+
+        # fetch one extra row to know whether there is a next page
+        params = {'status': status, 'limit': limit + 1, 'offset': offset}
+
+        if engine.dialect.name == 'sqlite':
+            match = cls._sqlite_match(q)
+            if not match:
+                return {'results': [], 'has_more': False}
+            cls._ensure_sqlite_index()
+            statement, params['q'] = _SQLITE_SEARCH, match
+        else:
+            statement, params['q'] = _POSTGRES_SEARCH, q
+            params['opts'] = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=24, MinWords=8'
+
+        with SessionLocal() as session:
+            rows = session.execute(statement, params).mappings().all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        products = {product['product_id']: product for product in ProductService.retrieve_products(
+            [row['id'] for row in rows])}
+        results = []
+        for row in rows:
+            if row['id'] not in products:
+                continue
+            results.append({
+                'product': products[row['id']],
+                'rank': float(row['rank']),
+                'highlights': {field: row[field] or None for field in HIGHLIGHT_FIELDS},
+            })
+        return {'results': results, 'has_more': has_more}
+
+    @staticmethod
+    def _sqlite_match(q: str) -> str:
+        # quote every term so user input can't inject FTS5 syntax, and prefix-match each one
+        terms = re.findall(r'\w+', q)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    @classmethod
+    def _ensure_sqlite_index(cls):
+        if cls._sqlite_ready:
+            return
+        with cls._sqlite_lock:
+            if cls._sqlite_ready:
+                return
+            with engine.begin() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")).first()
+                if not exists:
+                    for statement in _SQLITE_SETUP:
+                        connection.execute(text(statement))
+            cls._sqlite_ready = True
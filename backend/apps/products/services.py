@@ -1,15 +1,48 @@
-from itertools import product as options_combination
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from itertools import islice, product as options_combination
+from math import prod
 
-from fastapi import Request
-from sqlalchemy import select, and_, or_
+from fastapi import Request, HTTPException, status as status_codes
+from sqlalchemy import select, insert, delete, and_, or_, func, tuple_, case
+from sqlalchemy.orm import aliased
 
+from apps.core.conditional import ConditionalGet
 from apps.core.date_time import DateTime
+from apps.core.pagination import Cursor
+from apps.core.responses import dumps, loads, json_array, json_object
 # from apps.core.services.media import MediaService
 from apps.core.services.cloudinary_service import CloudinaryService
-
-from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia
+from apps.core.services.cache import get_cache
+from apps.core.services.image_processing import ImageProcessor
+
+from apps.products.inventory import InventoryService, RECEIPT
+from apps.products.media_cleanup import MediaDeletionQueue
+from apps.products.models import (
+    Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia, ProductListing, InventoryMovement
+)
 from config import settings
-from config.database import get_db, SessionLocal
+from config.database import get_db, SessionLocal, engine
+
+if engine.dialect.name == 'postgresql':
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
+PRODUCT_LIST_SORTS = ('newest', 'price_asc', 'price_desc', 'name')
+
+# nested collections of a product payload, selectable with `?include=`
+PRODUCT_EMBEDS = ('options', 'variants', 'media')
+# product_listing columns, only returned when asked for with `?fields=`
+PRODUCT_LISTING_FIELDS = ('min_price', 'max_price', 'in_stock', 'primary_image')
+PRODUCT_FIELDS = (
+    'product_id', 'product_name', 'description', 'ingredients', 'how_to_use', 'category', 'product_type',
+    'status', 'created_at', 'updated_at', 'published_at',
+)
+
+# serialized `retrieve_product` / `retrieve_variants` payloads, keyed by product id
+product_cache = get_cache("products")
 
 
 class ProductService:
@@ -29,10 +62,20 @@ class ProductService:
     @classmethod
     def create_product(cls, data: dict, get_obj: bool = False):
 
+        # refuse option matrices that would explode before anything is written
+        combinations = cls.count_variants(data.get('options'))
+        if combinations > settings.max_variants_per_product:
+            raise HTTPException(
+                status_code=status_codes.HTTP_400_BAD_REQUEST,
+                detail=f"Options produce {combinations} variants, "
+                       f"the limit is {settings.max_variants_per_product}.")
+
         cls._create_product(data)
         cls.__create_product_options()
         cls.__create_variants()
 
+        cls.sync_listing(cls.product.id)
+        cls.invalidate_cache(cls.product.id)
         if get_obj:
             return cls.product
         return cls.retrieve_product(cls.product.id)
@@ -52,80 +95,104 @@ class ProductService:
             'status': data.get('status', 'draft')
         }
         
-        options_data = data.get('options', [])
-        variants_data = data.get('variants', [])
-        product_images_data = data.get('product_images', [])
-        
-        # Step 1: Create the base product
-        cls.product = Product.create(**product_data)
-        
-        # Step 2: Create options and their items
-        option_items_map = {}  # Maps option values to item IDs
-        if options_data:
-            for option in options_data:
-                new_option = ProductOption.create(
-                    product_id=cls.product.id, 
-                    option_name=option['option_name']
-                )
-                
-                for item_name in option['items']:
-                    new_item = ProductOptionItem.create(
-                        option_id=new_option.id, 
-                        item_name=item_name
-                    )
+        options_data = data.get('options') or []
+        variants_data = data.get('variants') or []
+        product_images_data = data.get('product_images') or []
+
+        # The whole graph is written in one transaction with one multi-row
+        # INSERT ... RETURNING per table, so nothing is left behind on failure.
+        with SessionLocal() as session:
+            try:
+                # Step 1: Create the base product
+                product_id = session.execute(
+                    insert(Product).values(**product_data).returning(Product.id)
+                ).scalar_one()
+
+                # Step 2: Create options and their items
+                option_items_map = {}  # Maps option values to item IDs
+                if options_data:
+                    option_ids = session.scalars(
+                        insert(ProductOption).returning(ProductOption.id, sort_by_parameter_order=True),
+                        [{'product_id': product_id, 'option_name': option['option_name']}
+                         for option in options_data]
+                    ).all()
+
+                    items = [
+                        {'option_id': option_id, 'item_name': item_name}
+                        for option_id, option in zip(option_ids, options_data)
+                        for item_name in option['items']
+                    ]
+                    item_ids = session.scalars(
+                        insert(ProductOptionItem).returning(ProductOptionItem.id, sort_by_parameter_order=True),
+                        items
+                    ).all()
+
                     # Map the item name to its ID for later variant creation
-                    option_items_map[item_name] = new_item.id
-        
-        # Step 3: Create variants with their specific data
-        if variants_data:
-            for variant in variants_data:
-                # Map option values (strings) to option item IDs
-                option1_id = option_items_map.get(variant.get('option1')) if variant.get('option1') else None
-                option2_id = option_items_map.get(variant.get('option2')) if variant.get('option2') else None
-                option3_id = option_items_map.get(variant.get('option3')) if variant.get('option3') else None
-                
-                # Create the variant
-                new_variant = ProductVariant.create(
-                    product_id=cls.product.id,
-                    option1=option1_id,
-                    option2=option2_id,
-                    option3=option3_id,
-                    price=variant['price'],
-                    stock=variant['stock']
-                )
-                
-                # Create variant-specific images
-                variant_images = variant.get('images', [])
-                for img in variant_images:
-                    ProductMedia.create(
-                        product_id=cls.product.id,
-                        variant_id=new_variant.id,  # Link to specific variant
-                        alt=img.get('alt'),
-                        src=img['src'],
-                        type=img.get('type', 'image'),
-                        cloudinary_id=img['cloudinary_id']
-                    )
-        else:
-            # No variants - create a default variant
-            ProductVariant.create(
-                product_id=cls.product.id,
-                price=0,
-                stock=0
-            )
-        
-        # Step 4: Create product-level images (not variant-specific)
-        for img in product_images_data:
-            ProductMedia.create(
-                product_id=cls.product.id,
-                variant_id=None,  # Product-level image
-                alt=img.get('alt'),
-                src=img['src'],
-                type=img.get('type', 'image'),
-                cloudinary_id=img['cloudinary_id']
-            )
-        
+                    for item, item_id in zip(items, item_ids):
+                        option_items_map[item['item_name']] = item_id
+
+                # Step 3: Create variants with their specific data
+                media_rows = []
+                if variants_data:
+                    variant_ids = session.scalars(
+                        insert(ProductVariant).returning(ProductVariant.id, sort_by_parameter_order=True),
+                        [
+                            {
+                                'product_id': product_id,
+                                # Map option values (strings) to option item IDs
+                                'option1': option_items_map.get(variant.get('option1')) if variant.get('option1') else None,
+                                'option2': option_items_map.get(variant.get('option2')) if variant.get('option2') else None,
+                                'option3': option_items_map.get(variant.get('option3')) if variant.get('option3') else None,
+                                'price': variant['price'],
+                            }
+                            for variant in variants_data
+                        ]
+                    ).all()
+                    # opening stock goes through the inventory ledger
+                    InventoryService.record(session, RECEIPT, {
+                        variant_id: variant['stock'] for variant_id, variant in zip(variant_ids, variants_data)
+                    }, note="initial stock")
+
+                    # Collect variant-specific images
+                    for variant_id, variant in zip(variant_ids, variants_data):
+                        for img in variant.get('images') or []:
+                            media_rows.append(cls._media_row(product_id, img, variant_id))
+                else:
+                    # No variants - create a default variant
+                    session.execute(insert(ProductVariant).values(product_id=product_id, price=0))
+
+                # Step 4: Product-level images (not variant-specific)
+                for img in product_images_data:
+                    media_rows.append(cls._media_row(product_id, img))
+
+                if media_rows:
+                    session.execute(insert(ProductMedia), media_rows)
+
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
         # Return the complete product data
-        return cls.retrieve_product(cls.product.id)
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
+        return cls.retrieve_product(product_id)
+
+    @staticmethod
+    def _media_row(product_id: int, img: dict, variant_id: int | None = None):
+        return {
+            'product_id': product_id,
+            'variant_id': variant_id,  # None for product-level images
+            'alt': img.get('alt'),
+            'src': img['src'],
+            'type': img.get('type', 'image'),
+            'cloudinary_id': img['cloudinary_id'],
+            'width': img.get('width'),
+            'height': img.get('height'),
+            'bytes': img.get('bytes'),
+            'phash': img.get('phash'),
+            'content_hash': img.get('content_hash'),
+        }
 
     @classmethod
     def _create_product(cls, data: dict):
@@ -193,76 +260,178 @@ class ProductService:
 
         if cls.options:
 
-            # create variants by options combination
+            # create variants by options combination; combinations are generated
+            # lazily and written in batches, all in one transaction
             items_id = cls.get_item_ids_by_product_id(cls.product.id)
-            variants = list(options_combination(*items_id))
-            for variant in variants:
-                values_tuple = tuple(variant)
-
-                # set each value to an option and set none if it doesn't exist
-                while len(values_tuple) < 3:
-                    values_tuple += (None,)
-                option1, option2, option3 = values_tuple
-
-                ProductVariant.create(
-                    product_id=cls.product.id,
-                    option1=option1,
-                    option2=option2,
-                    option3=option3,
-                    price=cls.price,
-                    stock=cls.stock
-                )
+            combinations = options_combination(*items_id)
+            batch_size = settings.variant_insert_batch_size
+
+            with SessionLocal() as session:
+                try:
+                    while batch := list(islice(combinations, batch_size)):
+                        rows = []
+                        for variant in batch:
+                            values_tuple = tuple(variant)
+
+                            # set each value to an option and set none if it doesn't exist
+                            while len(values_tuple) < 3:
+                                values_tuple += (None,)
+                            option1, option2, option3 = values_tuple
+
+                            rows.append({
+                                'product_id': cls.product.id,
+                                'option1': option1,
+                                'option2': option2,
+                                'option3': option3,
+                                'price': cls.price,
+                            })
+                        variant_ids = session.scalars(insert(ProductVariant).returning(ProductVariant.id), rows).all()
+                        InventoryService.record(
+                            session, RECEIPT, dict.fromkeys(variant_ids, cls.stock), note="initial stock")
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
         else:
             # set a default variant
-            ProductVariant.create(
-                product_id=cls.product.id,
-                price=cls.price,
-                stock=cls.stock
-            )
+            with SessionLocal() as session:
+                variant_id = session.execute(
+                    insert(ProductVariant).values(product_id=cls.product.id, price=cls.price)
+                    .returning(ProductVariant.id)
+                ).scalar_one()
+                InventoryService.record(session, RECEIPT, {variant_id: cls.stock}, note="initial stock")
+                session.commit()
 
         cls.variants = cls.retrieve_variants(cls.product.id)
 
+    @staticmethod
+    def count_variants(options_data: list | None) -> int:
+        """
+        Number of variants `create_product` would generate for these options.
+        """
+
+        if not options_data:
+            return 1
+        return prod(len(option['items']) for option in options_data)
+
+    @classmethod
+    def preview_variants(cls, options_data: list, sample_size: int = 10):
+        """
+        Dry run of the variant matrix: report the combination count and the first
+        few combinations (as item names) without writing anything.
+        """
+
+        combinations = cls.count_variants(options_data)
+        item_names = [option['items'] for option in options_data or []]
+        return {
+            'combinations': combinations,
+            'max_variants': settings.max_variants_per_product,
+            'allowed': combinations <= settings.max_variants_per_product,
+            'sample': [list(combination) for combination in
+                       islice(options_combination(*item_names), sample_size)] if item_names else [],
+        }
+
     @classmethod
     def retrieve_variants(cls, product_id):
         """
         Get all variants of a product
         """
 
-        product_variants = []
-        variants: list[ProductVariant] = ProductVariant.filter(ProductVariant.product_id == product_id).all()
-        for variant in variants:
-            product_variants.append(
-                {
-                    "variant_id": variant.id,
-                    "product_id": variant.product_id,
-                    "price": variant.price,
-                    "stock": variant.stock,
-                    "option1": variant.option1,
-                    "option2": variant.option2,
-                    "option3": variant.option3,
-                    "created_at": DateTime.string(variant.created_at),
-                    "updated_at": DateTime.string(variant.updated_at)
-                })
+        return product_cache.remember(f"variants:{product_id}", lambda: cls._load_variants(product_id))
+
+    @classmethod
+    def _load_variants(cls, product_id):
+        with SessionLocal() as session:
+            rows = session.execute(
+                cls._variants_query().where(ProductVariant.product_id == product_id)
+            ).all()
+        product_variants = [cls._serialize_variant(*row) for row in rows]
 
         if product_variants:
             return product_variants
         return None
 
+    @classmethod
+    def retrieve_variant(cls, variant_id: int):
+        with SessionLocal() as session:
+            row = session.execute(cls._variants_query().where(ProductVariant.id == variant_id)).first()
+        if row is None:
+            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="ProductVariant not found.")
+        return cls._serialize_variant(*row)
+
+    @classmethod
+    def resolve_variant(cls, product_id: int, selection: list[str | None], by: str = 'name'):
+        """
+        Find the variant of a product by its option items, given per position (option1..3)
+        as item names, or item ids with `by='id'`. Positions left out match variants without
+        that option, so the lookup is an equality on every column of the (product_id,
+        option1, option2, option3) index. 404 if no variant matches, 409 if several do.
+        """
+
+        if not any(selection):
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST,
+                                detail="Select at least one option item.")
+
+        criteria = [ProductVariant.product_id == product_id]
+        for column, value in zip((ProductVariant.option1, ProductVariant.option2, ProductVariant.option3), selection):
+            if not value:
+                criteria.append(column.is_(None))
+            elif by == 'id':
+                if not value.isdigit():
+                    raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST,
+                                        detail=f"Invalid option item id: {value}")
+                criteria.append(column == int(value))
+            else:
+                criteria.append(column.in_(
+                    select(ProductOptionItem.id)
+                    .join(ProductOption, ProductOption.id == ProductOptionItem.option_id)
+                    .where(ProductOption.product_id == product_id, ProductOptionItem.item_name == value)
+                ))
+
+        with SessionLocal() as session:
+            rows = session.execute(cls._variants_query().where(*criteria).limit(2)).all()
+        if not rows:
+            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND,
+                                detail="No variant matches the selected options.")
+        if len(rows) > 1:
+            raise HTTPException(status_code=status_codes.HTTP_409_CONFLICT,
+                                detail="More than one variant matches the selected options.")
+        return cls._serialize_variant(*rows[0])
+
     @staticmethod
-    def retrieve_variant(variant_id: int):
-        variant = ProductVariant.get_or_404(variant_id)
-        variant_data = {
+    def _variants_query():
+        """Variants with their current stock and option item names, see `_serialize_variant`."""
+
+        items = [aliased(ProductOptionItem) for _ in range(3)]
+        return (
+            select(ProductVariant, InventoryService.stock_expression(), *(item.item_name for item in items))
+            .outerjoin(items[0], items[0].id == ProductVariant.option1)
+            .outerjoin(items[1], items[1].id == ProductVariant.option2)
+            .outerjoin(items[2], items[2].id == ProductVariant.option3)
+        )
+
+    @staticmethod
+    def _serialize_variant(variant: ProductVariant, stock: int, *item_names: str | None):
+        """
+        `stock` is the variant's current stock, see `InventoryService.stock_expression`;
+        `item_names` are the names of its option1..3 items.
+        """
+        item_names = (item_names + (None, None, None))[:3]
+        return {
             "variant_id": variant.id,
             "product_id": variant.product_id,
             "price": variant.price,
-            "stock": variant.stock,
+            "stock": stock,
             "option1": variant.option1,
             "option2": variant.option2,
             "option3": variant.option3,
+            "option1_name": item_names[0],
+            "option2_name": item_names[1],
+            "option3_name": item_names[2],
+            "title": " / ".join(name for name in item_names if name) or None,
             "created_at": DateTime.string(variant.created_at),
             "updated_at": DateTime.string(variant.updated_at)
         }
-        return variant_data
 
     @classmethod
     def get_item_ids_by_product_id(cls, product_id):
@@ -275,6 +444,7 @@ class ProductService:
                 session.query(ProductOptionItem.option_id, ProductOptionItem.id)
                 .join(ProductOption)
                 .filter(ProductOption.product_id == product_id)
+                .order_by(ProductOptionItem.option_id, ProductOptionItem.id)
                 .all()
             )
 
@@ -289,30 +459,167 @@ class ProductService:
 
         return item_ids_by_option
 
+    @staticmethod
+    def parse_representation(fields: str | None, include: str | None) -> tuple[set | None, set | None]:
+        """
+        Parse comma separated `?fields=` / `?include=` values into the `fields` and
+        `include` sets taken by `retrieve_product(s)`; None means the full payload.
+
+        `fields` picks top-level keys (`product_id` is always returned) and may name
+        `PRODUCT_LISTING_FIELDS` too. `include` picks the embedded collections; without
+        it, only those named in `fields` are embedded, or all when `fields` is absent.
+        """
+
+        def names(value):
+            return {name.strip() for name in value.split(',') if name.strip()}
+
+        field_set = names(fields) if fields is not None else None
+        include_set = names(include) if include is not None else None
+
+        unknown = (field_set or set()) - set(PRODUCT_FIELDS + PRODUCT_LISTING_FIELDS + PRODUCT_EMBEDS)
+        if unknown:
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST,
+                                detail=f"Invalid fields: {', '.join(sorted(unknown))}")
+        unknown = (include_set or set()) - set(PRODUCT_EMBEDS)
+        if unknown:
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST,
+                                detail=f"Invalid include: {', '.join(sorted(unknown))}")
+
+        if field_set is not None:
+            if include_set is None:
+                include_set = field_set & set(PRODUCT_EMBEDS)
+            field_set = (field_set - set(PRODUCT_EMBEDS)) | {'product_id'}
+        return field_set, include_set
+
+    @staticmethod
+    def _is_full(fields: set | None, include: set | None) -> bool:
+        return fields is None and (include is None or include >= set(PRODUCT_EMBEDS))
+
+    @staticmethod
+    def _project(payload: dict, fields: set | None, include: set | None) -> dict:
+        """Keep only the requested keys of a serialized product."""
+
+        keys = set(PRODUCT_FIELDS) if fields is None else fields
+        keys = keys | (set(PRODUCT_EMBEDS) if include is None else include)
+        return {key: value for key, value in payload.items() if key in keys}
+
+    @classmethod
+    def retrieve_product(cls, product_id, fields: set | None = None, include: set | None = None):
+        """
+        The full payload is cached; a partial one (see `parse_representation`) is cut
+        from the cached payload when there is one, otherwise only the requested
+        collections are queried.
+        """
+
+        if cls._is_full(fields, include):
+            return product_cache.remember(f"product:{product_id}", lambda: cls._load_product(product_id))
+
+        cached = None
+        if not (fields or set()) & set(PRODUCT_LISTING_FIELDS):
+            cached = product_cache.get(f"product:{product_id}")
+        if cached is not None:
+            return cls._project(loads(cached), fields, include)
+
+        products = cls.retrieve_products([product_id], fields, include)
+        if not products:
+            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="Product not found.")
+        return products[0]
+
     @classmethod
-    def retrieve_product(cls, product_id):
+    def _load_product(cls, product_id):
         cls.product = Product.get_or_404(product_id)
         cls.options = cls.retrieve_options(product_id)
         cls.variants = cls.retrieve_variants(product_id)
         cls.media = cls.retrieve_media_list(product_id)
+        return cls._serialize_product(cls.product, cls.options, cls.variants, cls.media)
 
-        product = {
-            'product_id': cls.product.id,
-            'product_name': cls.product.product_name,
-            'description': cls.product.description,
-            'ingredients': cls.product.ingredients,
-            'how_to_use': cls.product.how_to_use,
-            'category': cls.product.category,
-            'product_type': cls.product.product_type,
-            'status': cls.product.status,
-            'created_at': DateTime.string(cls.product.created_at),
-            'updated_at': DateTime.string(cls.product.updated_at),
-            'published_at': DateTime.string(cls.product.published_at),
-            'options': cls.options,
-            'variants': cls.variants,
-            'media': cls.media
+    @staticmethod
+    def _serialize_product(product: Product, options: list | None, variants: list | None, media: list | None):
+        return {
+            'product_id': product.id,
+            'product_name': product.product_name,
+            'description': product.description,
+            'ingredients': product.ingredients,
+            'how_to_use': product.how_to_use,
+            'category': product.category,
+            'product_type': product.product_type,
+            'status': product.status,
+            'created_at': DateTime.string(product.created_at),
+            'updated_at': DateTime.string(product.updated_at),
+            'published_at': DateTime.string(product.published_at),
+            'options': options,
+            'variants': variants,
+            'media': media
+        }
+
+    @staticmethod
+    def invalidate_cache(product_id: int):
+        """
+        Drop the cached payloads of a product. Call after any write that changes
+        the product, its options, variants or media.
+        """
+
+        product_cache.delete(f"product:{product_id}", f"variants:{product_id}", f"validators:{product_id}",
+                             *product_cache.compressed_keys(f"product-body:{product_id}"))
+        # catalog-wide entries (facets, list pages) are keyed by this version
+        product_cache.bump_version('catalog')
+
+    @classmethod
+    def product_validators(cls, product_id: int):
+        """
+        Return the `version` and `last_modified` timestamp of a product's whole graph
+        (product, options, variants and media) for conditional GETs, without
+        building the product payload.
+        """
+
+        return product_cache.remember(f"validators:{product_id}", lambda: cls._load_validators(product_id))
+
+    @staticmethod
+    def _load_validators(product_id: int):
+        def newest(model):
+            return (
+                select(func.max(func.coalesce(model.updated_at, model.created_at)))
+                .where(model.product_id == product_id)
+                .scalar_subquery()
+            )
+
+        def count(model):
+            return select(func.count(model.id)).where(model.product_id == product_id).scalar_subquery()
+
+        # stock moves through the ledger without touching the variant rows
+        def newest_movement(column):
+            return (
+                select(func.max(column))
+                .join(ProductVariant, ProductVariant.id == InventoryMovement.variant_id)
+                .where(ProductVariant.product_id == product_id)
+                .scalar_subquery()
+            )
+
+        # a single round trip; the counts catch deletions that leave no newer timestamp behind
+        with SessionLocal() as session:
+            row = session.execute(
+                select(
+                    func.coalesce(Product.updated_at, Product.created_at),
+                    newest(ProductVariant),
+                    count(ProductVariant),
+                    newest(ProductMedia),
+                    count(ProductMedia),
+                    count(ProductOption),
+                    newest_movement(InventoryMovement.id),
+                    newest_movement(InventoryMovement.created_at),
+                ).where(Product.id == product_id)
+            ).first()
+
+        if row is None:
+            raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="Product not found.")
+
+        product_ts, variants_ts, variants_count, media_ts, media_count, options_count, movement_id, movement_ts = row
+        timestamps = [ConditionalGet.timestamp(ts)
+                      for ts in (product_ts, variants_ts, media_ts, movement_ts) if ts is not None]
+        return {
+            'version': f"{product_id}:{':'.join(str(ts) for ts in row)}",
+            'last_modified': max(timestamps) if timestamps else None,
         }
-        return product
 
     @classmethod
     def update_product(cls, product_id, **kwargs):
@@ -323,56 +630,474 @@ class ProductService:
 
         # --- update product ---
         Product.update(product_id, **kwargs)
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
         return cls.retrieve_product(product_id)
 
     @classmethod
     def update_variant(cls, variant_id, **kwargs):
         # check variant exist
-        ProductVariant.get_or_404(variant_id)
+        variant = ProductVariant.get_or_404(variant_id)
+
+        # stock is set through the inventory ledger, as an adjustment
+        stock = kwargs.pop('stock', None)
+        if stock is not None:
+            with SessionLocal() as session:
+                InventoryService.set_stock(session, {variant_id: stock}, note="variant update")
+                session.commit()
 
         # TODO `updated_at` is autoupdate dont need to code
         kwargs['updated_at'] = DateTime.now()
         ProductVariant.update(variant_id, **kwargs)
+        cls.sync_listing(variant.product_id)
+        cls.invalidate_cache(variant.product_id)
 
         return cls.retrieve_variant(variant_id)
 
     @classmethod
-    def list_products(cls, limit: int = 100):
-        # - if "default variant" is not set, first variant will be
-        # - on list of products, for price, get it from "default variant"
-        # - if price or stock of default variant is 0 then select first variant that is not 0
-        # - or for price, get it from "less price"
-        # do all of them with graphql and let the front devs decide witch query should be run.
+    def retrieve_products(cls, product_ids: list[int], fields: set | None = None, include: set | None = None):
+        """
+        Hydrate many products at once.
 
-        # also can override the list `limit` in settings.py
-        if hasattr(settings, 'products_list_limit'):
-            limit = settings.products_list_limit
+        Loads products, options, option items, variants and media for all the
+        given ids with one IN-list query per table (five round trips in total,
+        regardless of how many products or options there are) and returns them
+        in the same shape as `retrieve_product`, preserving the order of
+        `product_ids`. Unknown ids are skipped.
 
-        products_list = []
+        With `fields` / `include` (see `parse_representation`) the payloads are cut
+        down and the tables of collections that aren't included are not queried.
+        """
+
+        if not product_ids:
+            return []
+
+        embeds = set(PRODUCT_EMBEDS) if include is None else include
+        listing_fields = (fields or set()) & set(PRODUCT_LISTING_FIELDS)
+
+        options, items, variants, media_rows, listings = [], [], [], [], []
         with SessionLocal() as session:
             products = session.execute(
-                select(Product.id).limit(limit)
+                select(Product).where(Product.id.in_(product_ids))
             ).scalars().all()
 
-        for product_id in products:
-            products_list.append(cls.retrieve_product(product_id))
+            if 'options' in embeds:
+                options = session.execute(
+                    select(ProductOption)
+                    .where(ProductOption.product_id.in_(product_ids))
+                    .order_by(ProductOption.id)
+                ).scalars().all()
+
+                items = session.execute(
+                    select(ProductOptionItem)
+                    .join(ProductOption)
+                    .where(ProductOption.product_id.in_(product_ids))
+                    .order_by(ProductOptionItem.id)
+                ).scalars().all()
+
+            if 'variants' in embeds:
+                variants = session.execute(
+                    cls._variants_query()
+                    .where(ProductVariant.product_id.in_(product_ids))
+                    .order_by(ProductVariant.id)
+                ).all()
+
+            if 'media' in embeds:
+                media_rows = session.execute(
+                    select(ProductMedia)
+                    .where(ProductMedia.product_id.in_(product_ids))
+                    .order_by(ProductMedia.id)
+                ).scalars().all()
+
+            if listing_fields:
+                listings = session.execute(
+                    select(ProductListing).where(ProductListing.product_id.in_(product_ids))
+                ).scalars().all()
+
+        # group children by their parent id
+        items_by_option = {}
+        for item in items:
+            items_by_option.setdefault(item.option_id, []).append(
+                {'item_id': item.id, 'item_name': item.item_name})
+
+        options_by_product = {}
+        for option in options:
+            options_by_product.setdefault(option.product_id, []).append({
+                'options_id': option.id,
+                'option_name': option.option_name,
+                'items': items_by_option.get(option.id, [])
+            })
+
+        variants_by_product = {}
+        for variant, *columns in variants:
+            variants_by_product.setdefault(variant.product_id, []).append(cls._serialize_variant(variant, *columns))
 
+        media_by_product = {}
+        for media in media_rows:
+            media_by_product.setdefault(media.product_id, []).append(cls._serialize_media(media))
+
+        listings_by_product = {listing.product_id: listing for listing in listings}
+        full = cls._is_full(fields, include)
+
+        products_by_id = {product.id: product for product in products}
+        products_list = []
+        for product_id in product_ids:
+            product = products_by_id.get(product_id)
+            if product is None:
+                continue
+            payload = cls._serialize_product(
+                product,
+                options=options_by_product.get(product_id),
+                variants=variants_by_product.get(product_id),
+                media=media_by_product.get(product_id),
+            )
+            if not full:
+                listing = listings_by_product.get(product_id)
+                for field in listing_fields:
+                    payload[field] = getattr(listing, field, None)
+                payload = cls._project(payload, fields, include)
+            products_list.append(payload)
         return products_list
 
+    @classmethod
+    def retrieve_product_encoded(cls, product_id: int) -> bytes:
+        """`retrieve_product` as the cached JSON bytes."""
+
+        return product_cache.remember_encoded(f"product:{product_id}", lambda: cls._load_product(product_id))
+
+    @classmethod
+    def retrieve_product_body(cls, product_id: int, encoding: str | None = None) -> tuple[bytes, str | None]:
+        """
+        GET /products/{id} body as cached JSON bytes, precompressed with `encoding` when
+        it's worth it; returns the body and the encoding applied.
+        """
+
+        return product_cache.remember_compressed(
+            f"product-body:{product_id}",
+            lambda: json_object({'product': cls.retrieve_product_encoded(product_id)}),
+            encoding,
+        )
+
+    @classmethod
+    def _encoded_products(cls, product_ids: list[int]) -> dict[int, bytes]:
+        """
+        Full payloads of the existing `product_ids`, as the JSON bytes cached under the
+        `product:{id}` entries shared with `retrieve_product`. Cached payloads are read in
+        one cache round trip, the rest are hydrated with `retrieve_products` and cached.
+        """
+
+        cached = product_cache.get_many([f"product:{product_id}" for product_id in product_ids])
+        encoded = {product_id: value for product_id, value in zip(product_ids, cached) if value is not None}
+        loaded = {product['product_id']: product_cache.dumps(product) for product in
+                  cls.retrieve_products([product_id for product_id in product_ids if product_id not in encoded])}
+        product_cache.set_many({f"product:{product_id}": value for product_id, value in loaded.items()})
+        return encoded | loaded
+
+    @classmethod
+    def retrieve_products_batch(cls, product_ids: list[int], fields: set | None = None,
+                                include: set | None = None) -> dict:
+        """
+        Products by id for pages that show many of them (cart, orders, wishlist), in
+        input order, plus the ids that don't exist. Payloads come from the product
+        cache (see `_encoded_products`); listing fields always come from the database.
+        """
+
+        product_ids = list(dict.fromkeys(product_ids))
+        if (fields or set()) & set(PRODUCT_LISTING_FIELDS):
+            products = {product['product_id']: product
+                        for product in cls.retrieve_products(product_ids, fields, include)}
+        else:
+            products = {product_id: cls._project(loads(value), fields, include)
+                        for product_id, value in cls._encoded_products(product_ids).items()}
+
+        return {
+            'products': [products[product_id] for product_id in product_ids if product_id in products],
+            'missing': [product_id for product_id in product_ids if product_id not in products],
+        }
+
+    @classmethod
+    def retrieve_products_batch_encoded(cls, product_ids: list[int]) -> bytes:
+        """`retrieve_products_batch` with full payloads, as JSON bytes spliced from the product cache."""
+
+        product_ids = list(dict.fromkeys(product_ids))
+        encoded = cls._encoded_products(product_ids)
+        return json_object({
+            'products': json_array(encoded[product_id] for product_id in product_ids if product_id in encoded),
+            'missing': dumps([product_id for product_id in product_ids if product_id not in encoded]),
+        })
+
+    @classmethod
+    def list_products(cls, fields: set | None = None, include: set | None = None, **filters):
+        """
+        Return one page of products (see `_list_page` for the `filters`) and the cursor
+        of the next page. `fields` / `include` cut down the product payloads, see
+        `parse_representation`.
+        """
+
+        product_ids, next_cursor = cls._list_page(**filters)
+        return {
+            'products': cls.retrieve_products(product_ids, fields, include),
+            'next_cursor': next_cursor
+        }
+
+    @classmethod
+    def list_products_encoded(cls, **filters) -> bytes:
+        """`list_products` with full payloads, as JSON bytes spliced from the product cache."""
+
+        product_ids, next_cursor = cls._list_page(**filters)
+        encoded = cls._encoded_products(product_ids)
+        return json_object({
+            'products': json_array(encoded[product_id] for product_id in product_ids if product_id in encoded),
+            'next_cursor': dumps(next_cursor),
+        })
+
+    @classmethod
+    def list_products_body(cls, encoding: str | None = None, **filters) -> tuple[bytes, str | None]:
+        """
+        `list_products_encoded` cached per page and precompressed with `encoding` when it's
+        worth it (see `Cache.remember_compressed`); returns the body and the encoding applied.
+        Pages are keyed by the catalog version, so any product write retires them.
+        """
+
+        key = f"products-page:{product_cache.version('catalog')}:{dumps(sorted(filters.items())).decode()}"
+        return product_cache.remember_compressed(key, lambda: cls.list_products_encoded(**filters), encoding)
+
+    @classmethod
+    def _list_page(
+            cls,
+            limit: int | None = None,
+            cursor: str | None = None,
+            status: str | None = 'active',
+            category: str | None = None,
+            product_type: str | None = None,
+            min_price: float | None = None,
+            max_price: float | None = None,
+            in_stock: bool | None = None,
+            sort: str = 'newest') -> tuple[list[int], str | None]:
+        """
+        Return the product ids of one page and the cursor of the next page.
+
+        Filtering, sorting and paging read only the `product_listing` table. Prices
+        there are each product's lowest variant price, which `min_price` / `max_price`
+        and the `price_*` sorts apply to (products without a price are left out of
+        those sorts). Pagination is keyset based: the cursor holds
+        the sort value and id of the last product of the previous page, so a deep page
+        costs the same as the first.
+        """
+
+        if sort not in PRODUCT_LIST_SORTS:
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST, detail=f"Invalid sort: {sort}")
+
+        # also can override the list `limit` in settings.py
+        if limit is None:
+            limit = getattr(settings, 'products_list_limit', 12)
+
+        query = cls._filter_products(
+            select(ProductListing.product_id), status, category, product_type, min_price, max_price, in_stock)
+
+        # --- sort key ---
+        if sort == 'newest':
+            sort_column, value_type, descending = ProductListing.created_at, datetime, True
+        elif sort == 'name':
+            sort_column, value_type, descending = ProductListing.product_name, str, False
+        else:
+            sort_column, value_type, descending = ProductListing.min_price, Decimal, sort == 'price_desc'
+            # products without variants have no price: row comparison never lets a NULL
+            # past a cursor, and NULLs sort first or last by direction, so leave them out
+            query = query.where(ProductListing.min_price.is_not(None))
+        query = query.add_columns(sort_column)
+
+        # --- keyset ---
+        if cursor:
+            last_value, last_id = Cursor.decode(cursor, sort, value_type)
+            if descending:
+                query = query.where(tuple_(sort_column, ProductListing.product_id) < tuple_(last_value, last_id))
+            else:
+                query = query.where(tuple_(sort_column, ProductListing.product_id) > tuple_(last_value, last_id))
+
+        if descending:
+            query = query.order_by(sort_column.desc(), ProductListing.product_id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), ProductListing.product_id.asc())
+
+        # fetch one extra row to know whether there is a next page
+        with SessionLocal() as session:
+            rows = session.execute(query.limit(limit + 1)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_id, last_value = rows[-1]
+            next_cursor = Cursor.encode(sort, last_value, last_id)
+
+        return [product_id for product_id, _ in rows], next_cursor
+
     @staticmethod
-    def delete_product(product_id: int):
-        product = Product.get_or_404(product_id)
+    def _filter_products(query, status=None, category=None, product_type=None, min_price=None, max_price=None,
+                         in_stock=None):
+        """
+        Apply the product listing filters to a query selecting from `ProductListing`.
+        """
 
-        # delete all cloudinary images first
-        media_list = ProductMedia.filter(ProductMedia.product_id == product_id).all()
-        for media in media_list:
-            if media.cloudinary_id:
-                CloudinaryService.delete_image(media.cloudinary_id)
+        if status is not None:
+            query = query.where(ProductListing.status == status)
+        if category is not None:
+            query = query.where(ProductListing.category == category)
+        if product_type is not None:
+            query = query.where(ProductListing.product_type == product_type)
+        if min_price is not None:
+            query = query.where(ProductListing.min_price >= min_price)
+        if max_price is not None:
+            query = query.where(ProductListing.min_price <= max_price)
+        if in_stock is not None:
+            query = query.where(ProductListing.in_stock == in_stock)
+        return query
+
+    @classmethod
+    def sync_listing(cls, *product_ids: int):
+        """
+        Rebuild the `product_listing` rows of the given products from their variants
+        and media; products that no longer exist lose their row. Call after any write
+        that changes a product, its variants or its media.
+        """
+
+        if not product_ids:
+            return
+
+        variants = (
+            select(
+                ProductVariant.product_id,
+                func.min(ProductVariant.price).label('min_price'),
+                func.max(ProductVariant.price).label('max_price'),
+                func.coalesce(func.sum(InventoryService.stock_expression()), 0).label('total_stock'),
+            )
+            .where(ProductVariant.product_id.in_(product_ids))
+            .group_by(ProductVariant.product_id)
+            .subquery()
+        )
+        # product-level images come before variant images
+        primary_image = (
+            select(ProductMedia.src)
+            .where(ProductMedia.product_id == Product.id)
+            .order_by(case((ProductMedia.variant_id.is_(None), 0), else_=1), ProductMedia.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        rows = (
+            select(
+                Product.id,
+                Product.product_name,
+                Product.category,
+                Product.product_type,
+                Product.status,
+                Product.created_at,
+                variants.c.min_price,
+                variants.c.max_price,
+                func.coalesce(variants.c.total_stock, 0),
+                func.coalesce(variants.c.total_stock, 0) > 0,
+                primary_image,
+                func.now(),
+            )
+            .outerjoin(variants, variants.c.product_id == Product.id)
+            .where(Product.id.in_(product_ids))
+        )
+
+        columns = [
+            'product_id', 'product_name', 'category', 'product_type', 'status', 'created_at',
+            'min_price', 'max_price', 'total_stock', 'in_stock', 'primary_image', 'synced_at',
+        ]
+        # upsert rather than delete + insert: concurrent syncs of one product must not collide
+        statement = upsert(ProductListing).from_select(columns, rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductListing.product_id],
+            set_={column: statement.excluded[column] for column in columns[1:]},
+        )
+
+        with SessionLocal() as session:
+            try:
+                session.execute(statement)
+                session.execute(delete(ProductListing).where(
+                    ProductListing.product_id.in_(product_ids),
+                    ProductListing.product_id.not_in(select(Product.id).where(Product.id.in_(product_ids))),
+                ))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+    @classmethod
+    def product_facets(
+            cls,
+            status: str | None = 'active',
+            category: str | None = None,
+            product_type: str | None = None,
+            min_price: float | None = None,
+            max_price: float | None = None,
+            in_stock: bool | None = None):
+        """
+        Count the products matching the listing filters per category, product type,
+        price band (of the lowest variant price) and stock state.
+
+        Everything comes from one grouped aggregate over `product_listing`, folded
+        into per-facet counts here. Results are cached until the next catalog mutation.
+        """
+
+        filters = (status, category, product_type, min_price, max_price, in_stock)
+        key = f"facets:{product_cache.version('catalog')}:{filters}"
+        return product_cache.remember(key, lambda: cls._load_facets(*filters))
+
+    @classmethod
+    def _load_facets(cls, status, category, product_type, min_price, max_price, in_stock):
+        bounds = settings.product_price_bands
+        bands = [f"{low}-{high}" for low, high in zip(bounds, bounds[1:])] + [f"{bounds[-1]}+"]
+
+        # products without a priced variant have no band
+        price_band = case(
+            (ProductListing.min_price.is_(None), None),
+            *[(ProductListing.min_price < high, band) for high, band in zip(bounds[1:], bands)],
+            else_=bands[-1],
+        ).label('price_band')
+        stock = case((ProductListing.in_stock, 'in_stock'), else_='out_of_stock').label('stock')
+
+        query = cls._filter_products(
+            select(ProductListing.category, ProductListing.product_type, price_band, stock, func.count()),
+            status, category, product_type, min_price, max_price, in_stock,
+        ).group_by(ProductListing.category, ProductListing.product_type, price_band, stock)
+
+        with SessionLocal() as session:
+            rows = session.execute(query).all()
+
+        facets = {'category': {}, 'product_type': {}, 'price_band': dict.fromkeys(bands, 0),
+                  'stock': {'in_stock': 0, 'out_of_stock': 0}}
+        for row_category, row_product_type, row_band, row_stock, count in rows:
+            for facet, value in (('category', row_category), ('product_type', row_product_type),
+                                 ('price_band', row_band), ('stock', row_stock)):
+                if facet == 'price_band' and value is None:
+                    continue
+                facets[facet][value] = facets[facet].get(value, 0) + count
 
-        # pass PRIMARY KEY, not object
-        Product.delete(product.id)
+        return {
+            facet: [{'value': value, 'count': count} for value, count in counts.items()]
+            for facet, counts in facets.items()
+        }
 
+    @classmethod
+    def delete_product(cls, product_id: int):
+        """
+        Delete the product with its options, variants and media. The Cloudinary
+        assets are queued for deletion in the same transaction (see `MediaDeletionQueue`).
+        """
 
+        with SessionLocal() as session:
+            product = session.get(Product, product_id)
+            if product is None:
+                raise HTTPException(status_code=status_codes.HTTP_404_NOT_FOUND, detail="Product not found.")
+            MediaDeletionQueue.enqueue(session, [media.cloudinary_id for media in product.media])
+            session.delete(product)
+            session.commit()
+
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
 
     # -----------------------------
     # --- PRODUCT MEDIA METHODS ---
@@ -380,23 +1105,234 @@ class ProductService:
 
     @classmethod
     def create_media(cls, product_id: int, alt: str | None, files):
+        """
+        Upload `files` concurrently and attach the ones that succeeded to the product.
+        Duplicates of the product's images reuse their Cloudinary asset (see
+        `find_duplicate_media`), and are skipped when the product already has it.
+        Returns the product's media list, the per-file upload errors and the files
+        that reused an asset instead of being uploaded.
+        """
+
         product: Product = Product.get_or_404(product_id)
 
-        for file in files:
-            upload = CloudinaryService.upload_image(
-                file=file,
-                folder=f"products/{product_id}"
-            )
+        results = CloudinaryService.upload_images(
+            files, folder=f"products/{product_id}",
+            find_existing=partial(cls.find_duplicate_media, product_id=product_id))
+        uploads = [result["upload"] for result in results if "upload" in result]
+        errors = [result for result in results if "error" in result]
+        reused = [
+            {'filename': result["filename"], 'cloudinary_id': result["upload"]["public_id"]}
+            for result in results if result.get("upload", {}).get("reused")
+        ]
+        if not uploads:
+            raise HTTPException(status_code=status_codes.HTTP_502_BAD_GATEWAY, detail=errors)
 
-            ProductMedia.create(
-                product_id=product_id,
-                alt=alt or product.product_name,
-                src=upload["secure_url"],       # FULL CLOUDINARY URL
-                type=upload["format"],
-                cloudinary_id=upload["public_id"],
-            )
+        with SessionLocal() as session:
+            attached = set(session.scalars(
+                select(ProductMedia.cloudinary_id).where(ProductMedia.product_id == product_id)))
+            rows = []
+            for upload in uploads:
+                if upload["public_id"] in attached:
+                    continue
+                attached.add(upload["public_id"])
+                rows.append({
+                    'product_id': product_id,
+                    'alt': alt or product.product_name,
+                    'src': upload["secure_url"],       # FULL CLOUDINARY URL
+                    'type': upload["format"],
+                    'cloudinary_id': upload["public_id"],
+                    'width': upload["width"],
+                    'height': upload["height"],
+                    'bytes': upload["bytes"],
+                    'phash': upload["phash"],
+                    'content_hash': upload["content_hash"],
+                })
+            if rows:
+                session.execute(insert(ProductMedia), rows)
+                session.commit()
 
-        return cls.retrieve_media_list(product_id)
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
+        return {'media': cls.retrieve_media_list(product_id), 'errors': errors, 'reused': reused}
+
+    @staticmethod
+    def find_duplicate_media(fingerprint: dict, product_id: int):
+        """
+        Return the stored upload of `product_id`'s image with `fingerprint` (see
+        `ImageProcessor.fingerprint`), shaped like `CloudinaryService.upload_image`'s
+        result. Other products' assets are never reused: deleting one product would
+        take the shared asset away from the other.
+
+        By default only byte-identical images match. With `image_duplicate_distance` above
+        0, an image whose dhash is within that many bits and whose dimensions are the same
+        matches too (closest first).
+        """
+
+        max_distance = settings.image_duplicate_distance
+        if max_distance < 0:
+            return None
+
+        scope = [ProductMedia.product_id == product_id]
+        with SessionLocal() as session:
+            media = session.scalars(
+                select(ProductMedia)
+                .where(*scope, ProductMedia.content_hash == fingerprint['content_hash'])
+                .order_by(ProductMedia.id).limit(1)
+            ).first()
+            if media is None and max_distance > 0:
+                phash = fingerprint['phash']
+                # hashes within the distance share a piece with `phash` (see ImageProcessor.hash_chunks)
+                candidates = session.scalars(
+                    select(ProductMedia).where(
+                        *scope,
+                        ProductMedia.width == fingerprint['width'],
+                        ProductMedia.height == fingerprint['height'],
+                        or_(*(
+                            func.substr(ProductMedia.phash, start + 1, len(piece)) == piece
+                            for start, piece in ImageProcessor.hash_chunks(phash, max_distance)
+                        )),
+                    )
+                ).all()
+                distance, media = min(
+                    ((ImageProcessor.hash_distance(phash, candidate.phash), candidate) for candidate in candidates),
+                    key=lambda match: (match[0], match[1].id), default=(None, None))
+                if distance is not None and distance > max_distance:
+                    media = None
+            if media is None:
+                return None
+            return {
+                "url": media.src,
+                "secure_url": media.src,
+                "public_id": media.cloudinary_id,
+                "format": media.type,
+                "width": media.width,
+                "height": media.height,
+                "bytes": media.bytes,
+                "phash": media.phash,
+                "content_hash": media.content_hash,
+            }
+
+    @classmethod
+    def duplicate_media_clusters(cls, max_distance: int | None = None):
+        """
+        Group media whose hashes are within `max_distance` bits of each other
+        (transitively; defaults to `image_duplicate_distance`). Only groups of two or
+        more, largest first.
+        """
+
+        if max_distance is None:
+            max_distance = max(settings.image_duplicate_distance, 0)
+        with SessionLocal() as session:
+            media_rows = session.scalars(
+                select(ProductMedia).where(ProductMedia.phash.is_not(None)).order_by(ProductMedia.id)).all()
+
+        # union-find over pairs within the distance; only hashes sharing a piece
+        # (see ImageProcessor.hash_chunks) can be, so only those are compared
+        parent = list(range(len(media_rows)))
+
+        def root(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        buckets = {}
+        for index, media in enumerate(media_rows):
+            for piece in ImageProcessor.hash_chunks(media.phash, max_distance):
+                buckets.setdefault(piece, []).append(index)
+
+        hashes = [int(media.phash, 16) for media in media_rows]
+        for members in buckets.values():
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    if root(i) != root(j) and (hashes[i] ^ hashes[j]).bit_count() <= max_distance:
+                        parent[root(j)] = root(i)
+
+        clusters = {}
+        for index, media in enumerate(media_rows):
+            clusters.setdefault(root(index), []).append(media)
+
+        return sorted(
+            (
+                {
+                    'phash': members[0].phash,
+                    'assets': len({media.cloudinary_id for media in members}),
+                    'media': [cls._serialize_media(media) for media in members],
+                }
+                for members in clusters.values() if len(members) > 1
+            ),
+            key=lambda cluster: -len(cluster['media']),
+        )
+
+    @classmethod
+    def sign_media_upload(cls, product_id: int):
+        Product.get_or_404(product_id)
+        return CloudinaryService.sign_upload(folder=f"products/{product_id}")
+
+    @classmethod
+    def confirm_media(cls, product_id: int, uploads: list[dict], alt: str | None = None):
+        """
+        Attach images uploaded directly to Cloudinary (see `sign_media_upload`).
+        An upload is accepted only with a valid Cloudinary response signature and a
+        public_id inside the product's folder; images already attached are skipped.
+        Format, dimensions and size are read from Cloudinary, not from the request;
+        images over `MAX_FILE_SIZE` are rejected and queued for deletion.
+        """
+
+        product: Product = Product.get_or_404(product_id)
+        folder = f"products/{product_id}/"
+        with SessionLocal() as session:
+            variant_ids = set(session.scalars(
+                select(ProductVariant.id).where(ProductVariant.product_id == product_id)))
+
+        rows, errors, oversized = [], [], []
+        for upload in uploads:
+            if not CloudinaryService.verify_upload(upload['public_id'], upload['version'], upload['signature']):
+                errors.append({'filename': upload['public_id'], 'error': "Invalid upload signature."})
+                continue
+            if not upload['public_id'].startswith(folder):
+                errors.append({'filename': upload['public_id'], 'error': f"Upload is not in {folder}."})
+                continue
+            if upload.get('variant_id') is not None and upload['variant_id'] not in variant_ids:
+                errors.append({'filename': upload['public_id'], 'error': "Variant does not belong to the product."})
+                continue
+            try:
+                details = CloudinaryService.image_details(upload['public_id'])
+            except Exception as exc:
+                errors.append({'filename': upload['public_id'], 'error': f"Upload not found on Cloudinary: {exc}"})
+                continue
+            if (details['bytes'] or 0) > settings.MAX_FILE_SIZE * 1024 * 1024:
+                errors.append({'filename': upload['public_id'],
+                               'error': f"Image is larger than {settings.MAX_FILE_SIZE} MB."})
+                oversized.append(upload['public_id'])
+                continue
+            rows.append({
+                'product_id': product_id,
+                'variant_id': upload.get('variant_id'),
+                'alt': alt or product.product_name,
+                'src': CloudinaryService.image_url(upload['public_id'], details['version'], details['format']),
+                'type': details['format'],
+                'cloudinary_id': upload['public_id'],
+                'width': details['width'],
+                'height': details['height'],
+                'bytes': details['bytes'],
+            })
+
+        with SessionLocal() as session:
+            existing = set(session.scalars(
+                select(ProductMedia.cloudinary_id).where(ProductMedia.product_id == product_id)))
+            # rejected uploads sit in the product's folder, out of the temp sweep's reach
+            MediaDeletionQueue.enqueue(session, [public_id for public_id in oversized if public_id not in existing])
+            rows = [row for row in rows if row['cloudinary_id'] not in existing]
+            if rows:
+                session.execute(insert(ProductMedia), rows)
+            session.commit()
+        if len(errors) == len(uploads):
+            raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST, detail=errors)
+
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
+        return {'media': cls.retrieve_media_list(product_id), 'errors': errors}
 
     @classmethod
     def retrieve_media_list(cls, product_id: int):
@@ -404,28 +1340,28 @@ class ProductService:
         media_rows = ProductMedia.filter(ProductMedia.product_id == product_id).all()
 
         for media in media_rows:
-            media_list.append({
-                "media_id": media.id,
-                "product_id": media.product_id,
-                "alt": media.alt,
-                "src": media.src,               # already cloudinary URL
-                "type": media.type,
-                "created_at": DateTime.string(media.created_at),
-                "updated_at": DateTime.string(media.updated_at),
-            })
+            media_list.append(cls._serialize_media(media))
 
         return media_list or None
 
     @classmethod
     def retrieve_single_media(cls, media_id: int):
         media = ProductMedia.get_or_404(media_id)
+        return cls._serialize_media(media)
 
+    @staticmethod
+    def _serialize_media(media: ProductMedia):
         return {
             "media_id": media.id,
             "product_id": media.product_id,
             "alt": media.alt,
-            "src": media.src,
+            "src": media.src,               # already cloudinary URL
             "type": media.type,
+            "width": media.width,
+            "height": media.height,
+            "bytes": media.bytes,
+            "srcset": CloudinaryService.responsive_urls(
+                media.cloudinary_id, settings.product_image_widths, max_width=media.width),
             "created_at": DateTime.string(media.created_at),
             "updated_at": DateTime.string(media.updated_at),
         }
@@ -438,19 +1374,26 @@ class ProductService:
 
         #  Replace image if new file provided
         if file:
-            # delete old cloudinary image
-            if media.cloudinary_id:
-                CloudinaryService.delete_image(media.cloudinary_id)
-
+            # upload first: a rejected file must not cost the current image
             upload = CloudinaryService.upload_image(
                 file=file,
-                folder=f"products/{media.product_id}"
+                folder=f"products/{media.product_id}",
+                find_existing=partial(cls.find_duplicate_media, product_id=media.product_id),
             )
+            if media.cloudinary_id:
+                with SessionLocal() as session:
+                    MediaDeletionQueue.enqueue(session, [media.cloudinary_id])
+                    session.commit()
 
             update_data.update({
                 "src": upload["secure_url"],
                 "type": upload["format"],
                 "cloudinary_id": upload["public_id"],
+                "width": upload["width"],
+                "height": upload["height"],
+                "bytes": upload["bytes"],
+                "phash": upload["phash"],
+                "content_hash": upload["content_hash"],
             })
 
         if alt is not None:
@@ -459,36 +1402,33 @@ class ProductService:
         update_data["updated_at"] = DateTime.now()
 
         ProductMedia.update(media_id, **update_data)
+        cls.sync_listing(media.product_id)
+        cls.invalidate_cache(media.product_id)
         return cls.retrieve_single_media(media_id)
 
     @classmethod
     def delete_media_file(cls, media_id: int):
         media = ProductMedia.get_or_404(media_id)
-
-        if media.cloudinary_id:
-            CloudinaryService.delete_image(media.cloudinary_id)
-
-        ProductMedia.delete(media)
+        cls._delete_media(media.product_id, [media.id])
         return True
 
     @classmethod
     def delete_product_media(cls, product_id: int, media_ids: list[int]):
         product = Product.get_or_404(product_id)
-
-        for media_id in media_ids:
-            media = ProductMedia.filter(
-                ProductMedia.id == media_id,
-                ProductMedia.product_id == product.id
-            ).first()
-
-            if not media:
-                continue
-
-            # delete from cloudinary
-            if media.cloudinary_id:
-                CloudinaryService.delete_image(media.cloudinary_id)
-
-            # delete from DB (IMPORTANT FIX)
-            ProductMedia.delete(media.id)
-
+        cls._delete_media(product.id, media_ids)
         return True
+
+    @classmethod
+    def _delete_media(cls, product_id: int, media_ids: list[int]):
+        # rows go now; their Cloudinary assets are queued in the same transaction
+        with SessionLocal() as session:
+            cloudinary_ids = session.scalars(
+                delete(ProductMedia)
+                .where(ProductMedia.id.in_(media_ids), ProductMedia.product_id == product_id)
+                .returning(ProductMedia.cloudinary_id)
+            ).all()
+            MediaDeletionQueue.enqueue(session, cloudinary_ids)
+            session.commit()
+
+        cls.sync_listing(product_id)
+        cls.invalidate_cache(product_id)
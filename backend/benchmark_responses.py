@@ -0,0 +1,145 @@
+"""
+Compare response encoding paths on payloads shaped like GET /products/ and
+GET /orders/admin/allorders (no database needed):
+
+    python benchmark_responses.py
+    python benchmark_responses.py --products 48 --orders 500 --rounds 200
+
+- default:      what FastAPI does with a returned dict (response-model validation for
+                products, jsonable_encoder for orders, then stdlib json)
+- fast:         FastJSONResponse encoding the same dict
+- pre-encoded:  FastJSONResponse splicing the cached `product:{id}` bytes (products only)
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from apps.core.responses import FastJSONResponse, dumps, json_array, json_object
+from apps.products.schemas import ListProductOut
+
+
+def sample_product(product_id: int) -> dict:
+    created = datetime(2026, 1, 1) + timedelta(minutes=product_id)
+    return {
+        'product_id': product_id,
+        'product_name': f"Royal Oud Attar {product_id}",
+        'description': "A luxurious blend of pure oud with subtle floral notes. " * 4,
+        'ingredients': "Pure Oud Oil, Rose Extract, Sandalwood, Natural Musk",
+        'how_to_use': "Apply a small amount to pulse points such as wrists, behind ears, and neck.",
+        'category': "Our Best Sellers",
+        'product_type': "attar",
+        'status': "active",
+        'created_at': str(created),
+        'updated_at': None,
+        'published_at': None,
+        'options': [{
+            'options_id': product_id,
+            'option_name': "Size",
+            'items': [{'item_id': product_id * 10 + i, 'item_name': f"{size}ml"} for i, size in enumerate((3, 6, 12))],
+        }],
+        'variants': [{
+            'variant_id': product_id * 10 + i,
+            'product_id': product_id,
+            'price': Decimal("499.00") * (i + 1),
+            'stock': 20,
+            'option1': product_id * 10 + i,
+            'option2': None,
+            'option3': None,
+            'created_at': str(created),
+            'updated_at': None,
+        } for i in range(3)],
+        'media': [{
+            'media_id': product_id * 10 + i,
+            'product_id': product_id,
+            'alt': "Royal Oud Attar",
+            'src': f"https://res.cloudinary.com/demo/image/upload/v1/products/{product_id}/{i}.webp",
+            'type': "webp",
+            'width': 1920,
+            'height': 1920,
+            'bytes': 183_204,
+            'srcset': [{'width': width, 'url': f"https://res.cloudinary.com/demo/image/upload/w_{width}/{i}.webp"}
+                       for width in (320, 640, 960, 1280, 1920)],
+            'created_at': str(created),
+            'updated_at': None,
+        } for i in range(3)],
+    }
+
+
+def sample_order(order_id: int) -> dict:
+    created = datetime(2026, 1, 1) + timedelta(hours=order_id)
+    return {
+        'order_id': order_id,
+        'id': order_id,
+        'total_amount': 1497.0,
+        'status': "PLACED",
+        'created_at': created,
+        'user': {'user_id': order_id, 'email': f"user{order_id}@example.com", 'first_name': "A", 'last_name': "B"},
+        'payment': {'payment_id': order_id, 'amount': 1497.0, 'status': "captured", 'razorpay_order_id': "order_x",
+                    'razorpay_payment_id': "pay_x", 'created_at': created},
+        'items': [{'product_id': i, 'product_name': f"Royal Oud Attar {i}", 'variant_id': i * 10, 'quantity': 1,
+                   'price': 499.0, 'subtotal': 499.0} for i in range(3)],
+    }
+
+
+def measure(rounds: int, render) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        body = render()
+    return (time.perf_counter() - started) / rounds * 1000, len(body)
+
+
+async def default_products(field, page):
+    return JSONResponse(await serialize_response(field=field, response_content=page)).body
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark JSON response encoding.")
+    parser.add_argument("--products", type=int, default=48, help="products per list page")
+    parser.add_argument("--orders", type=int, default=500, help="orders in the admin list")
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    page = {'products': [sample_product(i) for i in range(1, args.products + 1)], 'next_cursor': "WyJuZXdlc3QiXQ"}
+    cached = [dumps(product) for product in page['products']]
+    orders = {'orders': [sample_order(i) for i in range(1, args.orders + 1)]}
+    field = create_response_field(name="Response_list_products", type_=ListProductOut)
+    loop = asyncio.new_event_loop()
+
+    results = {
+        f"list_products ({args.products} products)": {
+            'default': lambda: loop.run_until_complete(default_products(field, page)),
+            'fast': lambda: FastJSONResponse(page).body,
+            'pre-encoded': lambda: FastJSONResponse(json_object({
+                'products': json_array(cached), 'next_cursor': dumps(page['next_cursor'])})).body,
+        },
+        f"get_all_success_orders ({args.orders} orders)": {
+            'default': lambda: JSONResponse(jsonable_encoder(orders)).body,
+            'fast': lambda: FastJSONResponse(orders).body,
+        },
+    }
+
+    for endpoint, paths in results.items():
+        print(endpoint)
+        baseline = None
+        for name, render in paths.items():
+            elapsed, size = measure(args.rounds, render)
+            baseline = baseline or elapsed
+            print(f"  {name:<12} {elapsed:8.3f} ms/response  {size:>9} bytes  {baseline / elapsed:6.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    benchmark()
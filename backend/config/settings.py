@@ -85,10 +85,65 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
-
-
-MAX_FILE_SIZE = 5
+# concurrent uploads per process for multi-file media endpoints
+CLOUDINARY_UPLOAD_WORKERS = int(os.getenv("CLOUDINARY_UPLOAD_WORKERS") or 8)
+# uploads identical to an image of the same product reuse its asset; -1 disables.
+# Above 0, opts in to near-duplicates: dhash within this many bits (of 64) and the same dimensions
+image_duplicate_distance = 0
+# widths (px) of the resized URLs listed in each media's `srcset`
+product_image_widths = [320, 640, 960, 1280, 1920]
+# queued Cloudinary deletions: ids per Admin API call (max 100), retry backoff and poll interval
+media_deletion_batch_size = 100
+media_deletion_retry_seconds = 30
+media_deletion_max_retry_seconds = 3600
+media_deletion_poll_seconds = 60
+# wizard uploads in products/temp not attached to any product after this long are deleted
+temp_media_max_age_hours = 24
+temp_media_sweep_interval_hours = 6
+# inventory ledger: how often movements are folded into the variants' snapshot stock,
+# and how old a movement must be to be folded (recent ones stay visible in the ledger)
+inventory_snapshot_interval_seconds = 900
+inventory_snapshot_lag_seconds = 300
+
+
+MAX_FILE_SIZE = 5  # MB, per uploaded image
+# re-encode uploads before sending them to Cloudinary (see apps/core/services/image_processing.py)
+IMAGE_PREPROCESSING = os.getenv("IMAGE_PREPROCESSING", "true").lower() == "true"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION") or 2560)
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "webp")
+# values: "webp" | "jpeg"
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY") or 82)
 products_list_limit = 12
+products_list_max_limit = 100
+# ids per GET /products/batch request
+products_batch_max_ids = 100
+# lower bounds (INR) of the price bands reported by GET /products/facets
+product_price_bands = [0, 500, 1000, 2000, 5000]
+# variants generated from an options matrix: hard cap and rows per INSERT
+max_variants_per_product = 1000
+variant_insert_batch_size = 500
+# products per transaction in `python import_catalog.py`
+catalog_import_batch_size = 500
+# products hydrated per server-side cursor partition in GET /products/export
+catalog_export_batch_size = 200
+
+
+# Cache
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+# values: "memory" | "redis"
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS") or 300)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES") or 2048)
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+# Response compression (gzip, and brotli when the `brotli` package is installed)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE") or 1024)  # bytes
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL") or 6)
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY") or 5)
+COMPRESSION_CONTENT_TYPES = (
+    "application/json", "text/csv", "text/plain", "text/html", "text/css",
+    "application/javascript", "application/x-ndjson", "image/svg+xml",
+)
 
 
 PAYMENT_MODE: str = "mock"  
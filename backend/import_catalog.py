@@ -0,0 +1,62 @@
+"""
+Bulk import products, variants and media from a CSV or JSONL supplier feed.
+Files are streamed and upserted in batches (see apps/products/importer.py for the formats):
+
+    python import_catalog.py feed.jsonl
+    python import_catalog.py feed.csv --batch-size 1000 --errors import_errors.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path
+sys.path.append(str(Path(__file__).parent))
+
+from apps.products.importer import CatalogImporter
+
+
+def import_catalog():
+    parser = argparse.ArgumentParser(description="Import a product catalog feed.")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=None, help="products per transaction")
+    parser.add_argument("--errors", help="write rejected rows to this JSONL file")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    errors_file = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    totals = {"products": 0, "variants": 0, "media": 0, "errors": 0}
+    started = time.monotonic()
+
+    def on_batch(report):
+        totals["products"] += report.products
+        totals["variants"] += report.variants
+        totals["media"] += report.media
+        totals["errors"] += len(report.errors)
+        print(f"batch {report.batch}: {report.products} products, {report.variants} variants, "
+              f"{report.media} media, {len(report.errors)} errors "
+              f"({totals['products']} products in {time.monotonic() - started:.1f}s)")
+        for error in report.errors:
+            if errors_file:
+                errors_file.write(json.dumps(error, default=str) + "\n")
+            else:
+                print(f"  ✗ line {error['line']}: {error['error']}")
+
+    importer = CatalogImporter(batch_size=args.batch_size, on_batch=on_batch)
+    try:
+        with open(args.path, newline="", encoding="utf-8") as file:
+            documents = importer.read_csv(file) if file_format == "csv" else importer.read_jsonl(file)
+            importer.run(documents)
+    finally:
+        if errors_file:
+            errors_file.close()
+
+    print(f"\n✓ Imported {totals['products']} products, {totals['variants']} variants and "
+          f"{totals['media']} media with {totals['errors']} errors.")
+
+
+if __name__ == "__main__":
+    import_catalog()